@@ -1,28 +1,66 @@
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
-from datetime import datetime
+from datetime import datetime, date
+from decimal import Decimal
 import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
 import csv
 import io
-from sqlalchemy import extract
+import orjson
+from sqlalchemy import delete, event, insert, inspect, select, text, tuple_
+from sqlalchemy.schema import CreateColumn
 
 from models import db, Bill, LineItem
-from services.ocr_service import OCRService
-from services.analysis_service import AnalysisService
+from services.ocr_service import get_ocr_service
+from services.analysis_service import AnalysisService, date_filters
+
+def orjson_default(obj):
+    """Serialize types orjson doesn't handle natively"""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider that serializes with orjson (dates as ISO 8601 strings).
+    Keys are sorted, as with Flask's default provider."""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=orjson_default, option=orjson.OPT_SORT_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
 # Configuration
 DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///bills.db')
 UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'uploads')
+UPLOAD_PREFIX = os.path.join(UPLOAD_FOLDER, '')  # Upload folder with trailing separator
+ALLOWED_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'pdf', 'csv'})
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+LINE_ITEM_BATCH_SIZE = 1000  # Rows fetched per round trip when listing bills
+DEDUP_BATCH_SIZE = 400  # (shop, date) pairs per duplicate lookup; stays under SQLite's 999 bind parameter limit
+
+# Line-item CSV dates: MM/DD/YYYY, MM/DD/YY, YYYY-MM-DD or DD/MM/YYYY
+CSV_DATE_RE = re.compile(r'^(\d{1,4})([/-])(\d{1,2})\2(\d{1,4})$')
+
+# Strips currency symbols, thousands separators and whitespace from money cells in one pass
+MONEY_STRIP = str.maketrans('', '', '$, \t\r\n')
 
 app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'pdf', 'csv'}
+app.config['ALLOWED_EXTENSIONS'] = ALLOWED_EXTENSIONS
 
 # Initialize database
 db.init_app(app)
@@ -42,24 +80,268 @@ if DATABASE_URL.startswith('sqlite:///'):
             # Ensure directory is writable
             os.chmod(db_dir, 0o755)
 
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',  # Commits append to the WAL instead of fsyncing the rollback journal
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-65536',  # 64 MiB page cache
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',  # 256 MiB memory-mapped I/O
+    'PRAGMA foreign_keys=ON',  # Enforce FKs so ON DELETE CASCADE removes line items
+)
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune each new SQLite connection for bulk uploads and aggregate reads"""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
 # Create tables on startup
 with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', set_sqlite_pragmas)
     db.create_all()
+    # create_all skips columns and indexes added to tables that already exist
+    line_item_columns = {column['name'] for column in inspect(db.engine).get_columns('line_items')}
+    if 'line_total' not in line_item_columns:
+        with db.engine.begin() as connection:
+            column_ddl = CreateColumn(LineItem.__table__.c.line_total).compile(dialect=db.engine.dialect)
+            connection.execute(text(f'ALTER TABLE line_items ADD COLUMN {column_ddl}'))
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
 
 # Initialize services
-ocr_service = OCRService()
+# The shared OCRService loads OCR models, so get_ocr_service() creates it on first image upload
 analysis_service = AnalysisService()
+analysis_service.invalidate_on_commit(db.session)
+
+# Background OCR jobs, keyed by job id. Jobs live in this process's memory,
+# so polls must reach the process that accepted the upload (run one process)
+ocr_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('OCR_WORKERS', 2)))
+OCR_JOB_TTL = int(os.environ.get('OCR_JOB_TTL', 3600))  # Seconds a finished job is kept for polling
+OCR_JOB_LIMIT = int(os.environ.get('OCR_JOB_LIMIT', 1000))  # Finished jobs kept at most
+ocr_jobs = {}
+ocr_jobs_lock = threading.Lock()
+
+def evict_ocr_jobs():
+    """Drop finished jobs older than OCR_JOB_TTL seconds, and the oldest
+    finished jobs beyond OCR_JOB_LIMIT. Call with ocr_jobs_lock held."""
+    cutoff = time.monotonic() - OCR_JOB_TTL
+    # Finished jobs are re-inserted on completion, so dict order is completion order
+    finished = [job_id for job_id, job in ocr_jobs.items() if job['status'] != 'pending']
+    excess = len(finished) - OCR_JOB_LIMIT
+    for job_id in finished:
+        if excess > 0 or ocr_jobs[job_id]['finished_at'] < cutoff:
+            del ocr_jobs[job_id]
+            excess -= 1
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+    _, dot, ext = filename.rpartition('.')
+    return bool(dot) and ext.lower() in ALLOWED_EXTENSIONS
+
+def read_csv_rows(content):
+    """Parse CSV text into a list of rows (header row first), skipping empty lines"""
+    return [row for row in csv.reader(io.StringIO(content, newline=None)) if row]
+
+def save_upload(file, filepath):
+    """Write an uploaded file to disk in 1 MiB chunks"""
+    file.save(filepath, buffer_size=UPLOAD_CHUNK_SIZE)
+
+def parse_csv_date(date_str):
+    """Parse a line-item CSV date without probing formats via exceptions.
+    Returns None if the string is not a valid date."""
+    match = CSV_DATE_RE.match(date_str)
+    if not match:
+        return None
+    first, sep, second, last = match.groups()
+    
+    if sep == '-':
+        # Only ISO YYYY-MM-DD uses dashes
+        if len(first) != 4 or len(last) > 2:
+            return None
+        candidates = [(int(first), int(second), int(last))]
+    else:
+        if len(first) > 2:
+            return None
+        if len(last) == 4:
+            year = int(last)
+            # MM/DD/YYYY first, then DD/MM/YYYY
+            candidates = [(year, int(first), int(second)), (year, int(second), int(first))]
+        elif len(last) == 2:
+            # Two-digit years follow strptime's %y pivot
+            year = int(last)
+            year += 2000 if year < 69 else 1900
+            candidates = [(year, int(first), int(second))]
+        else:
+            return None
+    
+    for year, month, day in candidates:
+        if 1 <= month <= 12 and 1 <= day <= 31:
+            try:
+                return date(year, month, day)
+            except ValueError:
+                continue
+    return None
+
+def dedup_key(shop_name, bill_date, total_amount):
+    """Key used to detect duplicate bills (same shop, date, and total amount)"""
+    return (shop_name, bill_date, round(float(total_amount), 2))
+
+def existing_bill_keys(shop_dates):
+    """Fetch duplicate-check keys of stored bills matching any (shop_name, date) pair,
+    one query per batch of DEDUP_BATCH_SIZE pairs"""
+    shop_dates = list(shop_dates)
+    keys = set()
+    for start in range(0, len(shop_dates), DEDUP_BATCH_SIZE):
+        rows = db.session.execute(
+            select(Bill.shop_name, Bill.date, Bill.total_amount)
+            .where(tuple_(Bill.shop_name, Bill.date).in_(shop_dates[start:start + DEDUP_BATCH_SIZE]))
+        )
+        keys.update(dedup_key(*row) for row in rows)
+    return keys
+
+def bulk_insert_bills(bill_mappings, line_item_lists):
+    """Insert bills and their line items with one bulk INSERT per table.
+    Populates 'id' on each bill mapping."""
+    if not bill_mappings:
+        return
+    bill_ids = db.session.scalars(
+        insert(Bill).returning(Bill.id, sort_by_parameter_order=True), bill_mappings
+    ).all()
+    for bill, bill_id in zip(bill_mappings, bill_ids):
+        bill['id'] = bill_id
+    line_item_mappings = [
+        dict(item, bill_id=bill['id'])
+        for bill, items in zip(bill_mappings, line_item_lists)
+        for item in items
+    ]
+    if line_item_mappings:
+        db.session.execute(insert(LineItem), line_item_mappings)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy'}), 200
 
+def process_bill_image(filepath):
+    """Run OCR on a saved bill image and store the extracted bill.
+    Returns a (response body, status code) tuple."""
+    try:
+        # Extract data using OCR (now returns CSV format structure)
+        extracted_data = get_ocr_service().extract_from_image(filepath)
+        
+        # Parse date from ISO format string
+        date_str = extracted_data.get('Date', '')
+        try:
+            bill_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        except (ValueError, TypeError):
+            bill_date = datetime.now().date()
+        
+        shop_name = extracted_data.get('Shop Address', 'Unknown Shop')
+        total_amount = extracted_data.get('total_amount', 0.0)
+        
+        # Get line items in CSV format
+        csv_line_items = extracted_data.get('line_items', [])
+        
+        # Check for duplicate bill (same shop, date, and total amount)
+        existing_bill = db.session.execute(
+            select(Bill.id, Bill.shop_name, Bill.date, Bill.total_amount).filter_by(
+                shop_name=shop_name,
+                date=bill_date,
+                total_amount=total_amount
+            ).limit(1)
+        ).first()
+        
+        if existing_bill:
+            # Delete the uploaded file since it's a duplicate
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
+            
+            return {
+                'success': False,
+                'message': 'Duplicate bill detected. This bill already exists.',
+                'existing_bill_id': existing_bill.id,
+                'shop_name': existing_bill.shop_name,
+                'date': existing_bill.date.isoformat(),
+                'total_amount': existing_bill.total_amount
+            }, 409  # 409 Conflict
+        
+        # Calculate total from items if not provided
+        if total_amount == 0 and csv_line_items:
+            total_amount = sum(item.get('Total amount paid', 0.0) for item in csv_line_items)
+        
+        # Create bill record
+        bill = {
+            'shop_name': shop_name,
+            'date': bill_date,
+            'total_amount': total_amount,
+            'upload_type': 'image',
+            'file_path': filepath
+        }
+        
+        # Create line items from CSV format structure
+        # Match CSV upload logic: prioritize Item Sub Type, then Item Type, then Uncategorized
+        line_item_mappings = []
+        line_items = []
+        for item in csv_line_items:
+            # Get category - prioritize Item Sub Type over Item Type (same as CSV upload)
+            item_type = item.get('Item Type', '').strip()
+            item_sub_type = item.get('Item Sub Type', '').strip()
+            category = item_sub_type if item_sub_type and item_sub_type.lower() != 'na' else item_type if item_type else 'Uncategorized'
+            
+            line_item = {
+                'item_name': item.get('Item Name', ''),
+                'quantity': float(item.get('Quantity', 1.0)),
+                'price': float(item.get('Cost per unit', 0.0)),
+                'category': category
+            }
+            line_item_mappings.append(line_item)
+            # Echo values as they read back from the 2-decimal columns
+            line_items.append({
+                'name': line_item['item_name'],
+                'quantity': round(line_item['quantity'], 2),
+                'price': round(line_item['price'], 2),
+                'category': line_item['category']
+            })
+        
+        bulk_insert_bills([bill], [line_item_mappings])
+        db.session.commit()
+        
+        return {
+            'success': True,
+            'bill_id': bill['id'],
+            'shop_name': bill['shop_name'],
+            'date': bill_date.isoformat(),
+            'total_amount': round(float(total_amount), 2),
+            'line_items': line_items
+        }, 201
+    
+    except Exception as e:
+        db.session.rollback()
+        return {'error': f'Failed to process image: {str(e)}'}, 500
+
+def run_ocr_job(job_id, filepath):
+    """Background worker entry point for an image upload job"""
+    try:
+        with app.app_context():
+            result, status_code = process_bill_image(filepath)
+    except Exception as e:
+        result, status_code = {'error': f'Failed to process image: {str(e)}'}, 500
+    with ocr_jobs_lock:
+        ocr_jobs.pop(job_id, None)
+        ocr_jobs[job_id] = {
+            'status': 'completed',
+            'status_code': status_code,
+            'result': result,
+            'finished_at': time.monotonic()
+        }
+        evict_ocr_jobs()
+
 @app.route('/api/bills/upload-image', methods=['POST'])
 def upload_image():
-    """Upload a bill image and extract line items using OCR"""
+    """Upload a bill image and queue OCR extraction of its line items"""
     if 'file' not in request.files:
         return jsonify({'error': 'No file provided'}), 400
     
@@ -68,106 +350,39 @@ def upload_image():
         return jsonify({'error': 'No file selected'}), 400
     
     if file and allowed_file(file.filename):
+        # The job id keeps pending uploads with the same file name apart
+        job_id = uuid.uuid4().hex
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        filepath = f'{UPLOAD_PREFIX}{job_id}_{filename}'
+        save_upload(file, filepath)
         
-        try:
-            # Extract data using OCR (now returns CSV format structure)
-            extracted_data = ocr_service.extract_from_image(filepath)
-            
-            # Parse date from ISO format string
-            date_str = extracted_data.get('Date', '')
-            try:
-                bill_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-            except:
-                bill_date = datetime.now().date()
-            
-            shop_name = extracted_data.get('Shop Address', 'Unknown Shop')
-            total_amount = extracted_data.get('total_amount', 0.0)
-            
-            # Get line items in CSV format
-            csv_line_items = extracted_data.get('line_items', [])
-            
-            # Check for duplicate bill (same shop, date, and total amount)
-            existing_bill = Bill.query.filter_by(
-                shop_name=shop_name,
-                date=bill_date,
-                total_amount=total_amount
-            ).first()
-            
-            if existing_bill:
-                # Delete the uploaded file since it's a duplicate
-                try:
-                    os.remove(filepath)
-                except:
-                    pass
-                
-                return jsonify({
-                    'success': False,
-                    'message': 'Duplicate bill detected. This bill already exists.',
-                    'existing_bill_id': existing_bill.id,
-                    'shop_name': existing_bill.shop_name,
-                    'date': existing_bill.date.isoformat(),
-                    'total_amount': float(existing_bill.total_amount)
-                }), 409  # 409 Conflict
-            
-            # Calculate total from items if not provided
-            if total_amount == 0 and csv_line_items:
-                total_amount = sum(item.get('Total amount paid', 0.0) for item in csv_line_items)
-            
-            # Create bill record
-            bill = Bill(
-                shop_name=shop_name,
-                date=bill_date,
-                total_amount=total_amount,
-                upload_type='image',
-                file_path=filepath
-            )
-            db.session.add(bill)
-            db.session.flush()
-            
-            # Create line items from CSV format structure
-            # Match CSV upload logic: prioritize Item Sub Type, then Item Type, then Uncategorized
-            line_items = []
-            for item in csv_line_items:
-                # Get category - prioritize Item Sub Type over Item Type (same as CSV upload)
-                item_type = item.get('Item Type', '').strip()
-                item_sub_type = item.get('Item Sub Type', '').strip()
-                category = item_sub_type if item_sub_type and item_sub_type.lower() != 'na' else item_type if item_type else 'Uncategorized'
-                
-                line_item = LineItem(
-                    bill_id=bill.id,
-                    item_name=item.get('Item Name', ''),
-                    quantity=float(item.get('Quantity', 1.0)),
-                    price=float(item.get('Cost per unit', 0.0)),
-                    category=category
-                )
-                db.session.add(line_item)
-                line_items.append({
-                    'name': line_item.item_name,
-                    'quantity': float(line_item.quantity),
-                    'price': float(line_item.price),
-                    'category': line_item.category
-                })
-            
-            db.session.commit()
-            
-            return jsonify({
-                'success': True,
-                'bill_id': bill.id,
-                'shop_name': bill.shop_name,
-                'date': bill.date.isoformat(),
-                'total_amount': float(bill.total_amount),
-                'line_items': line_items
-            }), 201
+        # OCR can take seconds, so run it off the request thread
+        with ocr_jobs_lock:
+            ocr_jobs[job_id] = {'status': 'pending'}
+        ocr_executor.submit(run_ocr_job, job_id, filepath)
         
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'error': f'Failed to process image: {str(e)}'}), 500
+        return jsonify({'job_id': job_id, 'status': 'pending'}), 202  # 202 Accepted
     
     return jsonify({'error': 'Invalid file type'}), 400
 
+@app.route('/api/bills/job/<job_id>', methods=['GET'])
+def get_upload_job(job_id):
+    """Get the status of an image upload job, and its result once completed"""
+    with ocr_jobs_lock:
+        job = ocr_jobs.get(job_id)
+        # Finished jobs can be polled again until they expire
+        if (job is not None and job['status'] != 'pending' and
+                job['finished_at'] < time.monotonic() - OCR_JOB_TTL):
+            del ocr_jobs[job_id]
+            job = None
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if job['status'] == 'pending':
+        return jsonify({'job_id': job_id, 'status': 'pending'}), 202
+    
+    return jsonify({'job_id': job_id, 'status': job['status'], **job['result']}), job['status_code']
+
 @app.route('/api/bills/upload-csv', methods=['POST'])
 def upload_csv():
     """Upload a CSV file with bill data"""
@@ -180,68 +395,73 @@ def upload_csv():
     
     if file and allowed_file(file.filename):
         try:
-            # Read CSV content
+            # Read CSV content and parse it in a single pass
             file_content = file.stream.read().decode("UTF8")
-            stream = io.StringIO(file_content, newline=None)
-            csv_reader = csv.DictReader(stream)
+            rows = read_csv_rows(file_content)
             
-            # Detect CSV format by checking headers
-            headers = csv_reader.fieldnames or []
-            is_line_item_format = 'Item Name' in headers or any('item name' in h.lower() for h in headers) if headers else False
+            # Detect CSV format by checking headers (matched case-insensitively)
+            headers = [h.strip().lower() for h in rows[0]] if rows else []
+            is_line_item_format = any('item name' in h for h in headers)
             
-            # Reset stream for reading
-            stream = io.StringIO(file_content, newline=None)
-            csv_reader = csv.DictReader(stream)
+            # Column index table, resolved once per file. Absent columns point one past
+            # the last header; every data row is padded so that cell is ''
+            missing = len(headers)
+            col = {name: i for i, name in enumerate(headers)}
+            pad = [''] * (missing + 1)
+            data_rows = [[*row[:missing], *pad[min(len(row), missing):]] for row in rows[1:]]
             
             bills_created = []
             errors = []
+            bill_mappings = []
+            line_item_lists = []
             
             if is_line_item_format:
                 # Format: Each row is a line item with Date, Shop Address, etc.
-                bills_dict = {}  # Key: (date, shop_name), Value: list of line items
+                bills_dict = defaultdict(list)  # Key: (date, shop_name), Value: list of line items
+                
+                item_name_col = col.get('item name', missing)
+                date_col = col.get('date', missing)
+                shop_address_col = col.get('shop address', missing)
+                shop_name_col = col.get('shop name', missing)
+                total_col = col.get('total amount paid', missing)
+                quantity_col = col.get('quantity', missing)
+                cost_col = col.get('cost per unit', missing)
+                item_type_col = col.get('item type', missing)
+                item_sub_type_col = col.get('item sub type', missing)
                 
-                for row_num, row in enumerate(csv_reader, start=2):
+                for row_num, row in enumerate(data_rows, start=2):
                     try:
                         # Skip empty rows
-                        item_name = row.get('Item Name', '').strip()
+                        item_name = row[item_name_col].strip()
                         if not item_name or item_name.lower() in ['tax', 'tax :', '']:
                             continue
                         
                         # Parse date - handle formats like "02/09/2025", "2/15/2025"
-                        date_str = row.get('Date', '').strip()
-                        bill_date = None
-                        
-                        for date_format in ['%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d', '%d/%m/%Y']:
-                            try:
-                                bill_date = datetime.strptime(date_str, date_format).date()
-                                break
-                            except:
-                                continue
+                        date_str = row[date_col].strip()
+                        bill_date = parse_csv_date(date_str)
                         
                         if not bill_date:
                             continue
                         
                         # Get shop name
-                        shop_name = row.get('Shop Address', '').strip() or row.get('Shop Name', '').strip()
+                        shop_name = row[shop_address_col].strip() or row[shop_name_col].strip()
                         if not shop_name:
                             shop_name = 'Unknown Shop'
                         
                         # Create bill key
-                        bill_key = (bill_date.isoformat(), shop_name)
+                        bill_key = (bill_date, shop_name)
                         
                         # Parse item details
                         try:
                             # Get total amount paid for this item
-                            total_amount_str = row.get('Total amount paid', '').strip() or row.get('Total Amount Paid', '').strip()
-                            total_amount_str = total_amount_str.replace('$', '').replace(',', '').strip()
+                            total_amount_str = row[total_col].translate(MONEY_STRIP)
                             
                             # Get quantity
-                            quantity_str = row.get('Quantity', '').strip()
+                            quantity_str = row[quantity_col].strip()
                             quantity = float(quantity_str) if quantity_str and quantity_str.lower() != 'na' else 1.0
                             
                             # Get price per unit or use total amount
-                            cost_per_unit_str = row.get('Cost per unit', '').strip() or row.get('Cost Per Unit', '').strip()
-                            cost_per_unit_str = cost_per_unit_str.replace('$', '').replace(',', '').strip()
+                            cost_per_unit_str = row[cost_col].translate(MONEY_STRIP)
                             
                             if total_amount_str and total_amount_str.lower() != 'nan':
                                 item_total = float(total_amount_str)
@@ -250,14 +470,11 @@ def upload_csv():
                                 continue
                             
                             # Get category
-                            item_type = row.get('Item Type', '').strip() or row.get('Item type', '').strip()
-                            item_sub_type = row.get('Item Sub Type', '').strip() or row.get('Item Sub Type', '').strip()
+                            item_type = row[item_type_col].strip()
+                            item_sub_type = row[item_sub_type_col].strip()
                             category = item_sub_type if item_sub_type and item_sub_type.lower() != 'na' else item_type if item_type else 'Uncategorized'
                             
                             # Add to bills_dict
-                            if bill_key not in bills_dict:
-                                bills_dict[bill_key] = []
-                            
                             bills_dict[bill_key].append({
                                 'name': item_name,
                                 'quantity': quantity,
@@ -272,117 +489,126 @@ def upload_csv():
                     except Exception as e:
                         errors.append(f'Row {row_num}: {str(e)}')
                 
+                # Total each grouped bill before touching the database
+                candidates = [
+                    (shop_name, bill_date, sum(item['total'] for item in items), items)
+                    for (bill_date, shop_name), items in bills_dict.items()
+                ]
+                
+                # Fetch keys of already stored bills for all candidates in one query;
+                # bills queued from this upload are added as we go
+                known_keys = existing_bill_keys({
+                    (shop_name, bill_date) for shop_name, bill_date, _, _ in candidates
+                })
+                
                 # Create bills from grouped data
-                for (date_str, shop_name), items in bills_dict.items():
+                for shop_name, bill_date, total_amount, items in candidates:
                     try:
-                        bill_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                        total_amount = sum(item['total'] for item in items)
-                        
                         # Check for duplicate bill (same shop, date, and total amount)
-                        existing_bill = Bill.query.filter_by(
-                            shop_name=shop_name,
-                            date=bill_date,
-                            total_amount=total_amount
-                        ).first()
-                        
-                        if existing_bill:
+                        key = dedup_key(shop_name, bill_date, total_amount)
+                        if key in known_keys:
                             # Skip this bill, it's a duplicate
                             errors.append(f'Duplicate bill skipped: {shop_name} on {bill_date.isoformat()} with total ${total_amount:.2f}')
                             continue
                         
-                        # Create bill
-                        bill = Bill(
-                            shop_name=shop_name,
-                            date=bill_date,
-                            total_amount=total_amount,
-                            upload_type='csv',
-                            file_path=None
-                        )
-                        db.session.add(bill)
-                        db.session.flush()
-                        
-                        # Create line items
-                        for item in items:
-                            line_item = LineItem(
-                                bill_id=bill.id,
-                                item_name=item['name'],
-                                quantity=item['quantity'],
-                                price=item['price'],
-                                category=item['category']
-                            )
-                            db.session.add(line_item)
+                        # Queue bill and line items for bulk insert
+                        bill_mappings.append({
+                            'shop_name': shop_name,
+                            'date': bill_date,
+                            'total_amount': total_amount,
+                            'upload_type': 'csv',
+                            'file_path': None
+                        })
+                        line_item_lists.append([{
+                            'item_name': item['name'],
+                            'quantity': item['quantity'],
+                            'price': item['price'],
+                            'category': item['category']
+                        } for item in items])
+                        known_keys.add(key)
                         
                         bills_created.append({
-                            'bill_id': bill.id,
-                            'shop_name': bill.shop_name,
+                            'shop_name': shop_name,
                             'date': bill_date.isoformat(),
                             'item_count': len(items)
                         })
                     except Exception as e:
-                        errors.append(f'Failed to create bill for {shop_name} on {date_str}: {str(e)}')
+                        errors.append(f'Failed to create bill for {shop_name} on {bill_date.isoformat()}: {str(e)}')
             
             else:
                 # Original format: shop_name, date, total_amount, line_items
-                for row_num, row in enumerate(csv_reader, start=2):
+                date_col = col.get('date', missing)
+                shop_name_col = col.get('shop_name')
+                total_col = col.get('total_amount')
+                line_items_col = col.get('line_items', missing)
+                
+                row_bills = []
+                today = datetime.now().date()
+                for row in data_rows:
+                    # Parse date
+                    date_str = row[date_col]
                     try:
-                        # Parse date
-                        date_str = row.get('date', '')
-                        try:
-                            bill_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                        except:
-                            bill_date = datetime.now().date()
-                        
-                        shop_name = row.get('shop_name', 'Unknown')
-                        total_amount = float(row.get('total_amount', 0.0))
+                        bill_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+                    except (ValueError, TypeError):
+                        bill_date = today
+                    
+                    shop_name = row[shop_name_col] if shop_name_col is not None else 'Unknown'
+                    row_bills.append((shop_name, bill_date))
+                
+                # Fetch keys of already stored bills for all rows in one query;
+                # bills queued from this upload are added as we go
+                known_keys = existing_bill_keys(set(row_bills))
+                
+                for row_num, (row, (shop_name, bill_date)) in enumerate(zip(data_rows, row_bills), start=2):
+                    try:
+                        total_amount = float(row[total_col]) if total_col is not None else 0.0
                         
                         # Check for duplicate bill (same shop, date, and total amount)
-                        existing_bill = Bill.query.filter_by(
-                            shop_name=shop_name,
-                            date=bill_date,
-                            total_amount=total_amount
-                        ).first()
-                        
-                        if existing_bill:
+                        key = dedup_key(shop_name, bill_date, total_amount)
+                        if key in known_keys:
                             # Skip this bill, it's a duplicate
                             errors.append(f'Row {row_num}: Duplicate bill skipped - {shop_name} on {bill_date.isoformat()} with total ${total_amount:.2f}')
                             continue
                         
-                        # Create bill
-                        bill = Bill(
-                            shop_name=shop_name,
-                            date=bill_date,
-                            total_amount=total_amount,
-                            upload_type='csv',
-                            file_path=None
-                        )
-                        db.session.add(bill)
-                        db.session.flush()
-                        
                         # Parse line items (pipe-separated in CSV)
-                        line_items_str = row.get('line_items', '')
+                        line_items = []
+                        line_items_str = row[line_items_col]
                         if line_items_str:
                             items = line_items_str.split('|')
                             for item_str in items:
                                 parts = item_str.split(',')
                                 if len(parts) >= 3:
-                                    line_item = LineItem(
-                                        bill_id=bill.id,
-                                        item_name=parts[0].strip(),
-                                        quantity=float(parts[1].strip()) if parts[1].strip() else 1,
-                                        price=float(parts[2].strip()) if parts[2].strip() else 0.0,
-                                        category=parts[3].strip() if len(parts) > 3 and parts[3].strip() else 'Uncategorized'
-                                    )
-                                    db.session.add(line_item)
+                                    line_items.append({
+                                        'item_name': parts[0].strip(),
+                                        'quantity': float(parts[1].strip()) if parts[1].strip() else 1,
+                                        'price': float(parts[2].strip()) if parts[2].strip() else 0.0,
+                                        'category': parts[3].strip() if len(parts) > 3 and parts[3].strip() else 'Uncategorized'
+                                    })
+                        
+                        # Queue bill and line items for bulk insert
+                        bill_mappings.append({
+                            'shop_name': shop_name,
+                            'date': bill_date,
+                            'total_amount': total_amount,
+                            'upload_type': 'csv',
+                            'file_path': None
+                        })
+                        line_item_lists.append(line_items)
+                        known_keys.add(key)
                         
                         bills_created.append({
-                            'bill_id': bill.id,
-                            'shop_name': bill.shop_name,
+                            'shop_name': shop_name,
                             'date': bill_date.isoformat()
                         })
                     
                     except Exception as e:
                         errors.append(f'Row {row_num}: {str(e)}')
             
+            # Insert all bills, then all line items, in a single transaction
+            if bill_mappings:
+                bulk_insert_bills(bill_mappings, line_item_lists)
+                for created, bill in zip(bills_created, bill_mappings):
+                    created['bill_id'] = bill['id']
             db.session.commit()
             
             return jsonify({
@@ -404,32 +630,45 @@ def get_bills():
     month = request.args.get('month')
     year = request.args.get('year')
     
-    query = Bill.query
+    conditions = date_filters(
+        int(month) if month else None,
+        int(year) if year else None
+    )
     
-    if month:
-        query = query.filter(extract('month', Bill.date) == int(month))
-    if year:
-        query = query.filter(extract('year', Bill.date) == int(year))
+    # Read-only endpoint: select plain columns instead of hydrating ORM objects
+    bills = db.session.execute(
+        select(Bill.id, Bill.shop_name, Bill.date, Bill.total_amount, Bill.upload_type)
+        .where(*conditions)
+        .order_by(Bill.date.desc())
+    ).all()
     
-    bills = query.order_by(Bill.date.desc()).all()
-    
-    result = []
-    for bill in bills:
-        line_items = LineItem.query.filter_by(bill_id=bill.id).all()
-        result.append({
-            'id': bill.id,
-            'shop_name': bill.shop_name,
-            'date': bill.date.isoformat(),
-            'total_amount': bill.total_amount,
-            'upload_type': bill.upload_type,
-            'line_items': [{
-                'name': item.item_name,
-                'quantity': item.quantity,
-                'price': item.price,
-                'category': item.category
-            } for item in line_items]
+    # Load all line items for the selected bills in one query, streamed in
+    # batches (a server-side cursor where the driver supports one)
+    line_items = defaultdict(list)
+    item_rows = db.session.execute(
+        select(LineItem.bill_id, LineItem.item_name, LineItem.quantity, LineItem.price, LineItem.category)
+        .join(Bill)
+        .where(*conditions)
+        .order_by(LineItem.id)
+        .execution_options(yield_per=LINE_ITEM_BATCH_SIZE)
+    )
+    for item in item_rows:
+        line_items[item.bill_id].append({
+            'name': item.item_name,
+            'quantity': item.quantity,
+            'price': item.price,
+            'category': item.category
         })
     
+    result = [{
+        'id': bill.id,
+        'shop_name': bill.shop_name,
+        'date': bill.date,
+        'total_amount': bill.total_amount,
+        'upload_type': bill.upload_type,
+        'line_items': line_items.get(bill.id, [])
+    } for bill in bills]
+    
     return jsonify({'bills': result}), 200
 
 @app.route('/api/analysis/monthly', methods=['GET'])
@@ -457,12 +696,13 @@ def get_analysis_summary():
 def delete_all_bills():
     """Delete all bills from the database"""
     try:
-        # Get count before deletion
-        bill_count = Bill.query.count()
-        line_item_count = LineItem.query.count()
-        
-        # Delete all bills (line items will be cascade deleted)
-        Bill.query.delete()
+        # Unfiltered bulk deletes (children first); rowcount gives the deleted counts
+        line_item_count = db.session.execute(
+            delete(LineItem).execution_options(synchronize_session=False)
+        ).rowcount
+        bill_count = db.session.execute(
+            delete(Bill).execution_options(synchronize_session=False)
+        ).rowcount
         db.session.commit()
         
         return jsonify({
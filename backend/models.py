@@ -4,45 +4,78 @@ from decimal import Decimal
 
 db = SQLAlchemy()
 
+class RoundedNumeric(db.TypeDecorator):
+    """Numeric column read as a float rounded to the column's scale.
+    Matches what quantizing to Decimal gave (SQLite stores whatever float was
+    written), without a Decimal conversion per value. Sums and other
+    aggregates over these columns are rounded the same way."""
+    impl = db.Numeric
+    cache_ok = True
+    
+    def __init__(self, precision, scale):
+        super().__init__(precision, scale, asdecimal=False)
+    
+    def process_result_value(self, value, dialect):
+        # SQLite hands back whole numbers stored in a NUMERIC column as ints
+        return None if value is None else round(float(value), self.impl.scale)
+
 class Bill(db.Model):
     __tablename__ = 'bills'
+    __table_args__ = (
+        db.Index('ix_bill_dedup', 'shop_name', 'date', 'total_amount'),  # Duplicate bill checks
+        # Month/year range filters; covers the per-shop GROUP BY and SUM
+        db.Index('ix_bills_date_shop_amount', 'date', 'shop_name', 'total_amount'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     shop_name = db.Column(db.String(200), nullable=False)
     date = db.Column(db.Date, nullable=False)
-    total_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    total_amount = db.Column(RoundedNumeric(10, 2), nullable=False)
     upload_type = db.Column(db.String(20), nullable=False)  # 'image' or 'csv'
     file_path = db.Column(db.String(500), nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     
-    line_items = db.relationship('LineItem', backref='bill', lazy=True, cascade='all, delete-orphan')
+    # Eager 'selectin' loading: serializing N bills costs 2 queries, not N+1.
+    # passive_deletes: deleting a bill leaves its line items to ON DELETE CASCADE
+    line_items = db.relationship('LineItem', back_populates='bill', lazy='selectin',
+                                 cascade='all, delete-orphan', passive_deletes=True)
     
     def to_dict(self):
         return {
             'id': self.id,
             'shop_name': self.shop_name,
             'date': self.date.isoformat(),
-            'total_amount': float(self.total_amount),
+            'total_amount': self.total_amount,
             'upload_type': self.upload_type,
             'line_items': [item.to_dict() for item in self.line_items]
         }
 
 class LineItem(db.Model):
     __tablename__ = 'line_items'
+    __table_args__ = (
+        # Bill joins; cover the per-category and per-item GROUP BYs and SUMs
+        db.Index('ix_li_bill_category_linetotal', 'bill_id', 'category', 'line_total'),
+        db.Index('ix_li_bill_item_qty_linetotal', 'bill_id', 'item_name', 'quantity', 'line_total'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    bill_id = db.Column(db.Integer, db.ForeignKey('bills.id'), nullable=False)
+    bill_id = db.Column(db.Integer, db.ForeignKey('bills.id', ondelete='CASCADE'), nullable=False)
     item_name = db.Column(db.String(200), nullable=False)
-    quantity = db.Column(db.Numeric(10, 2), nullable=False, default=1)
-    price = db.Column(db.Numeric(10, 2), nullable=False)
+    quantity = db.Column(RoundedNumeric(10, 2), nullable=False, default=1)
+    price = db.Column(RoundedNumeric(10, 2), nullable=False)
     category = db.Column(db.String(100), nullable=False, default='Uncategorized')
+    # Generated by the database (STORED on PostgreSQL, VIRTUAL on SQLite, where
+    # the index above stores it) so aggregates sum it without multiplying per row
+    line_total = db.Column(RoundedNumeric(12, 2), db.Computed('price * quantity'), nullable=False)
+    
+    bill = db.relationship('Bill', back_populates='line_items')
     
     def to_dict(self):
         return {
             'id': self.id,
             'item_name': self.item_name,
-            'quantity': float(self.quantity),
-            'price': float(self.price),
+            'quantity': self.quantity,
+            'price': self.price,
             'category': self.category
         }
 
@@ -1,73 +1,191 @@
-from sqlalchemy import func, extract
-from datetime import datetime
+from sqlalchemy import cast, event, false, func, extract, literal, null, select, union_all
+from datetime import MAXYEAR, MINYEAR, date
+from collections import OrderedDict
+import copy
+import threading
 from models import db, Bill, LineItem
 
+ANALYSIS_CACHE_SIZE = 128  # Cached (query, month, year) results
+
+def date_range(year, month=None):
+    """Build Bill.date range conditions for a year, or for one month of it.
+    A year or month no date can fall in matches no bills instead of raising."""
+    if not MINYEAR <= year <= MAXYEAR or (month and not 1 <= month <= 12):
+        return [false()]
+    start = date(year, month or 1, 1)
+    if month and month < 12:
+        end = (year, month + 1)
+    else:
+        end = (year + 1, 1)
+    # There is no date after the last representable year to stop at
+    if end[0] > MAXYEAR:
+        return [Bill.date >= start]
+    return [Bill.date >= start, Bill.date < date(*end, 1)]
+
+def date_filters(month=None, year=None):
+    """Build Bill.date filter conditions for an optional month/year.
+    Uses date ranges where possible so the index on bills.date can be used."""
+    if year:
+        return date_range(year, month)
+    if month:
+        return [extract('month', Bill.date) == month]
+    return []
+
 class AnalysisService:
-    """Service for analyzing bills and generating reports"""
+    """Service for analyzing bills and generating reports.
+    Results are cached per (month, year) until a write to bills is committed."""
+    
+    def __init__(self):
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        # Bumped on every clear, so a query that overlapped a commit isn't cached
+        self.cache_generation = 0
+    
+    def clear_cache(self):
+        """Drop cached results"""
+        with self.cache_lock:
+            self.cache_generation += 1
+            self.cache.clear()
+    
+    def cached(self, key, query, *args):
+        """Return a copy of the cached result for key, running query(*args) on
+        a miss. The result is only stored if the cache wasn't cleared while the
+        query ran, since it may have read data from before that commit."""
+        with self.cache_lock:
+            result = self.cache.get(key)
+            if result is not None:
+                self.cache.move_to_end(key)
+                return copy.deepcopy(result)
+            generation = self.cache_generation
+        
+        result = query(*args)
+        with self.cache_lock:
+            if generation == self.cache_generation:
+                self.cache[key] = result
+                if len(self.cache) > ANALYSIS_CACHE_SIZE:
+                    self.cache.popitem(last=False)
+        # Callers get their own copy to modify
+        return copy.deepcopy(result)
+    
+    def invalidate_on_commit(self, session):
+        """Clear the cache whenever a transaction that wrote bills or line
+        items is committed on the given session"""
+        def mark_statement(orm_execute_state):
+            if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+                orm_execute_state.session.info['analysis_stale'] = True
+        
+        def mark_flush(session, flush_context):
+            if session.new or session.dirty or session.deleted:
+                session.info['analysis_stale'] = True
+        
+        def after_commit(session):
+            if session.info.pop('analysis_stale', False):
+                self.clear_cache()
+        
+        def after_rollback(session):
+            session.info.pop('analysis_stale', None)
+        
+        event.listen(session, 'do_orm_execute', mark_statement)
+        event.listen(session, 'after_flush', mark_flush)
+        event.listen(session, 'after_commit', after_commit)
+        event.listen(session, 'after_rollback', after_rollback)
     
     def get_monthly_analysis(self, month, year):
         """Get detailed monthly analysis"""
-        # Get all bills for the month
-        bills = Bill.query.filter(
-            extract('month', Bill.date) == month,
-            extract('year', Bill.date) == year
-        ).all()
-        
-        # Analysis by shop
-        shop_stats = db.session.query(
-            Bill.shop_name,
-            func.count(Bill.id).label('bill_count'),
-            func.sum(Bill.total_amount).label('total_spent')
-        ).filter(
-            extract('month', Bill.date) == month,
-            extract('year', Bill.date) == year
-        ).group_by(Bill.shop_name).all()
-        
-        shops = [{
-            'shop_name': stat.shop_name,
-            'bill_count': stat.bill_count,
-            'total_spent': float(stat.total_spent) if stat.total_spent else 0.0
-        } for stat in shop_stats]
-        
-        # Analysis by item category
-        category_stats = db.session.query(
+        return self.cached(('monthly', month, year), self.query_monthly_analysis, month, year)
+    
+    def get_summary(self, month=None, year=None):
+        """Get overall summary with optional month/year filter"""
+        return self.cached(('summary', month, year), self.query_summary, month, year)
+    
+    def query_monthly_analysis(self, month, year):
+        """Run the monthly analysis queries"""
+        # Bills for the month, shared by every aggregate below
+        month_bills = select(
+            Bill.id, Bill.shop_name, Bill.total_amount
+        ).where(*date_range(year, month)).cte('month_bills')
+        
+        # Totals, shop, category and top item aggregates are fetched in a
+        # single UNION ALL round trip and split apart by the 'kind' column
+        totals_query = select(
+            literal('total').label('kind'),
+            null().label('name'),
+            func.count(month_bills.c.id).label('count'),
+            cast(null(), LineItem.quantity.type).label('total_quantity'),
+            func.sum(month_bills.c.total_amount).label('total_spent')
+        )
+        
+        shop_query = select(
+            literal('shop'),
+            month_bills.c.shop_name,
+            func.count(month_bills.c.id),
+            null(),
+            func.sum(month_bills.c.total_amount)
+        ).group_by(month_bills.c.shop_name)
+        
+        category_query = select(
+            literal('category'),
             LineItem.category,
-            func.count(LineItem.id).label('item_count'),
-            func.sum(LineItem.price * LineItem.quantity).label('total_spent')
-        ).join(Bill).filter(
-            extract('month', Bill.date) == month,
-            extract('year', Bill.date) == year
-        ).group_by(LineItem.category).all()
-        
-        categories = [{
-            'category': stat.category,
-            'item_count': stat.item_count,
-            'total_spent': float(stat.total_spent) if stat.total_spent else 0.0
-        } for stat in category_stats]
-        
-        # Top items
-        item_stats = db.session.query(
+            func.count(LineItem.id),
+            null(),
+            func.sum(LineItem.line_total)
+        ).join(month_bills, LineItem.bill_id == month_bills.c.id).group_by(LineItem.category)
+        
+        # Top 20 items by spend, ranked with a window function so the same
+        # query can partition the ranking (e.g. per category) if needed
+        item_spent = func.sum(LineItem.line_total)
+        ranked_items = select(
             LineItem.item_name,
+            func.count(LineItem.id).label('purchase_count'),
             func.sum(LineItem.quantity).label('total_quantity'),
-            func.sum(LineItem.price * LineItem.quantity).label('total_spent'),
-            func.count(LineItem.id).label('purchase_count')
-        ).join(Bill).filter(
-            extract('month', Bill.date) == month,
-            extract('year', Bill.date) == year
-        ).group_by(LineItem.item_name).order_by(
-            func.sum(LineItem.price * LineItem.quantity).desc()
-        ).limit(20).all()
-        
-        top_items = [{
-            'item_name': stat.item_name,
-            'total_quantity': float(stat.total_quantity) if stat.total_quantity else 0.0,
-            'total_spent': float(stat.total_spent) if stat.total_spent else 0.0,
-            'purchase_count': stat.purchase_count
-        } for stat in item_stats]
-        
-        # Calculate totals
-        total_bills = len(bills)
-        total_spent = sum(float(bill.total_amount) for bill in bills)
+            item_spent.label('total_spent'),
+            func.row_number().over(order_by=item_spent.desc()).label('rank')
+        ).join(month_bills, LineItem.bill_id == month_bills.c.id).group_by(LineItem.item_name).subquery()
+        
+        item_query = select(
+            literal('item'),
+            ranked_items.c.item_name,
+            ranked_items.c.purchase_count,
+            ranked_items.c.total_quantity,
+            ranked_items.c.total_spent
+        ).where(ranked_items.c.rank <= 20)
+        
+        rows = db.session.execute(
+            union_all(totals_query, shop_query, category_query, item_query)
+        ).all()
+        
+        total_bills = 0
+        total_spent = 0.0
+        shops = []
+        categories = []
+        top_items = []
+        for row in rows:
+            spent = row.total_spent or 0.0
+            if row.kind == 'total':
+                total_bills = row.count
+                total_spent = spent
+            elif row.kind == 'shop':
+                shops.append({
+                    'shop_name': row.name,
+                    'bill_count': row.count,
+                    'total_spent': spent
+                })
+            elif row.kind == 'category':
+                categories.append({
+                    'category': row.name,
+                    'item_count': row.count,
+                    'total_spent': spent
+                })
+            else:
+                top_items.append({
+                    'item_name': row.name,
+                    'total_quantity': row.total_quantity or 0.0,
+                    'total_spent': spent,
+                    'purchase_count': row.count
+                })
+        
+        # Compound selects do not guarantee branch order, so re-rank top items
+        top_items.sort(key=lambda item: item['total_spent'], reverse=True)
         
         return {
             'month': month,
@@ -79,31 +197,23 @@ class AnalysisService:
             'top_items': top_items
         }
     
-    def get_summary(self, month=None, year=None):
-        """Get overall summary with optional month/year filter"""
-        query = Bill.query
-        
-        if month:
-            query = query.filter(extract('month', Bill.date) == month)
-        if year:
-            query = query.filter(extract('year', Bill.date) == year)
-        
-        bills = query.all()
-        
-        total_bills = len(bills)
-        total_spent = sum(float(bill.total_amount) for bill in bills) if bills else 0.0
-        
-        # Get unique shops
-        unique_shops = db.session.query(func.distinct(Bill.shop_name)).count()
+    def query_summary(self, month, year):
+        """Run the summary queries"""
+        conditions = date_filters(month, year)
+        
+        # Bill count, total and unique shops for the period, aggregated in the database
+        total_bills, total_spent, unique_shops = db.session.execute(
+            select(
+                func.count(Bill.id),
+                func.coalesce(func.sum(Bill.total_amount), 0.0),
+                func.count(func.distinct(Bill.shop_name))
+            ).where(*conditions)
+        ).one()
         
         # Get total items
-        line_item_query = LineItem.query.join(Bill)
-        if month:
-            line_item_query = line_item_query.filter(extract('month', Bill.date) == month)
-        if year:
-            line_item_query = line_item_query.filter(extract('year', Bill.date) == year)
-        
-        total_items = line_item_query.count()
+        total_items = db.session.scalar(
+            select(func.count(LineItem.id)).join(Bill).where(*conditions)
+        )
         
         # Average bill amount
         avg_bill_amount = total_spent / total_bills if total_bills > 0 else 0.0
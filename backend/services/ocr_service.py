@@ -1,7 +1,12 @@
 import re
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 import pytesseract
-from PIL import Image
+from pytesseract import Output
+from PIL import Image, ImageFilter
 import os
 
 # Try to import OpenCV for image preprocessing
@@ -19,6 +24,356 @@ try:
 except ImportError:
     EASYOCR_AVAILABLE = False
 
+# Try to import tesserocr, which keeps Tesseract and its language data loaded
+# in process instead of running the tesseract CLI for every image
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+# Try to import pyahocorasick for single-pass keyword matching in categorize_item
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Longest image edge, in pixels, kept by preprocessing; larger photos only
+# add OCR time, not accuracy
+PREPROCESS_MAX_EDGE = int(os.environ.get('OCR_MAX_IMAGE_EDGE', 1500))
+# Opt into slow non-local means denoising for noisy scans
+NLMEANS_DENOISE = os.environ.get('OCR_NLMEANS_DENOISE', '').lower() in ('1', 'true', 'yes')
+
+# Below this mean EasyOCR confidence the image is re-read with Tesseract
+EASYOCR_MIN_MEAN_CONFIDENCE = 0.4
+
+# Tesseract words below this confidence (0-100) are dropped, and a page with
+# fewer confident words than TESSERACT_MIN_WORDS is retried in another layout mode
+TESSERACT_MIN_CONFIDENCE = 30
+TESSERACT_MIN_WORDS = 5
+
+# Regexes used while parsing OCR text, compiled once at import
+DATE_RES = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})',  # MM/DD/YYYY or DD/MM/YYYY
+    r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})',  # YYYY/MM/DD
+    r'(\w{3,9})\s+(\d{1,2}),\s+(\d{4})',  # Month DD, YYYY
+)]
+TOTAL_RES = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'(?:total|grand\s+total|amount\s+due|balance)[:\s]*\$?\s*(\d{1,3}(?:[.,]\d{3})*(?:\.\d{2})?)',
+    r'\$\s*(\d{1,3}(?:[.,]\d{3})*(?:\.\d{2})?)\s*(?:total|due|amount)?',
+)]
+ITEM_RES = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'^(.+?)\s+\$?\s*(\d+\.?\d{2})\s*$',  # Item $price
+    r'^(.+?)\s+x?\s*(\d+(?:\.\d+)?)\s+\$?(\d+\.?\d{2})$',  # Item x2 $price
+    r'^(.+?)\s+(\d+\.?\d{2})\s*\$?\s*$',  # Item price
+    r'^(.+?)\s+(\d+)\s+x\s+\$?(\d+\.?\d{2})$',  # Item 2 x $price
+)]
+# The enhanced parser only accepts whole-number quantities in "Item x2 $price"
+ENHANCED_ITEM_RES = [
+    ITEM_RES[0],
+    re.compile(r'^(.+?)\s+x?\s*(\d+)\s+\$?(\d+\.?\d{2})$', re.IGNORECASE),
+    ITEM_RES[2],
+    ITEM_RES[3],
+]
+SKIP_QTY_X_RE = re.compile(r'^\d+(\.\d+)?[xX]\s*\$?\s*\d+')
+SKIP_NUMERIC_RE = re.compile(r'^\s*\$?\s*\d{1,2}(?:[.,]\d{3})*(?:\.\d{2})?\s*$')
+DATE_PREFIX_RE = re.compile(r'^\d{1,2}[/-]')
+FULL_DATE_PREFIX_RE = re.compile(r'^\d{1,2}[/-]\d{1,2}[/-]\d{2,4}')
+QTY_X_PREFIX_RE = re.compile(r'^\d+(\.\d+)?[xX]')
+
+# Substrings that mark a line as the shop name, or rule it out as one
+SHOP_KEYWORDS = ('store', 'shop', 'mart', 'market', 'supermarket', 'retail', 'grocery',
+                 'costco', 'walmart', 'target', 'safeway', 'kroger')
+SHOP_SKIP_KEYWORDS = ('date', 'time', 'invoice', 'receipt')
+# Substrings that mark a header/footer line rather than a line item
+ITEM_SKIP_KEYWORDS = ('item', 'description', 'qty', 'quantity', 'price', 'total', 'subtotal',
+                      'tax', 'receipt', 'invoice', 'date', 'time', 'cashier', 'register',
+                      'password', 'pin', 'card', 'signature', 'thank', 'visit', 'change',
+                      'cash', 'tendered', 'balance', 'discount', 'coupon', 'voucher',
+                      'refund', 'return', 'exchange', 'void', 'cancelled', 'transaction')
+
+# Looser keyword lists used by the enhanced parser
+ENHANCED_SHOP_KEYWORDS = ('store', 'shop', 'mart', 'market', 'supermarket', 'retail', 'grocery')
+ENHANCED_SHOP_SKIP_KEYWORDS = ('date', 'time', 'invoice', 'receipt', 'total', 'subtotal')
+ENHANCED_ITEM_SKIP_KEYWORDS = ('item', 'description', 'qty', 'quantity', 'price', 'total', 'subtotal',
+                               'tax', 'receipt', 'invoice', 'date', 'time', 'password', 'pin', 'card',
+                               'signature', 'thank', 'visit', 'change', 'cash', 'tendered', 'balance')
+
+@lru_cache(maxsize=1)
+def tesseract_available():
+    """Check for the tesseract binary, once per process: the probe spawns a
+    subprocess, and pytesseract only caches successful version lookups"""
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+def otsu_threshold(histogram):
+    """Return the gray level that best separates a 256-bin histogram into dark
+    and light pixels (Otsu's method)"""
+    total = sum(histogram)
+    sum_all = sum(level * count for level, count in enumerate(histogram))
+    sum_dark = 0
+    count_dark = 0
+    best_level, best_variance = 0, 0
+    for level, count in enumerate(histogram):
+        count_dark += count
+        if count_dark == 0:
+            continue
+        count_light = total - count_dark
+        if count_light == 0:
+            break
+        sum_dark += level * count
+        mean_dark = sum_dark / count_dark
+        mean_light = (sum_all - sum_dark) / count_light
+        variance = count_dark * count_light * (mean_dark - mean_light) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+def parse_price(price_str):
+    """Parse a price captured by the line item regexes: digits, optionally with
+    a dot before the last two. Integer cents / 100 gives the same float as float()."""
+    digits = price_str.replace('.', '')
+    if len(digits) == len(price_str):
+        return float(int(digits))
+    return int(digits) / 100
+
+def split_item_price(line):
+    """Split a stripped "name price" line without regexes. Returns the (name,
+    price) that ITEM_RES[0] would capture, or None if the line needs the regexes."""
+    parts = line.rsplit(None, 1)
+    # "name $ 1.99" captures the name without the "$"; leave that to the regexes
+    if len(parts) != 2 or parts[0].endswith('$'):
+        return None
+    name, price = parts
+    digits = price[1:] if price[0] == '$' else price
+    whole, dot, cents = digits.partition('.')
+    if dot:
+        if not (whole.isdecimal() and len(cents) == 2 and cents.isdecimal()):
+            return None
+    elif not (len(digits) >= 3 and digits.isdecimal()):
+        return None
+    return name, digits
+
+def item_alternation(item_res):
+    """Combine line item regexes into one alternation that matches where the
+    first matching regex would. Returns the pattern and, per regex, the group
+    numbers of its captures within the alternation."""
+    alternatives = []
+    group_numbers = []
+    next_group = 1
+    for index, pattern in enumerate(item_res):
+        alternatives.append(f'(?P<item{index}>{pattern.pattern})')
+        group_numbers.append(tuple(range(next_group + 1, next_group + 1 + pattern.groups)))
+        next_group += 1 + pattern.groups
+    return re.compile('|'.join(alternatives), re.IGNORECASE), group_numbers
+
+def keyword_pattern(keywords):
+    """Build one regex that finds any of the keywords as a substring"""
+    return re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+
+# Pattern bundles for the two parsing modes. shop_skip_first: a line with a
+# shop skip keyword can't be the shop name even if it has a shop keyword
+STRICT_PARSER = {
+    'shop_lines': 10,
+    'shop_re': keyword_pattern(SHOP_KEYWORDS),
+    'shop_skip_re': keyword_pattern(SHOP_SKIP_KEYWORDS),
+    'shop_skip_first': False,
+    'item_skip_re': keyword_pattern(ITEM_SKIP_KEYWORDS),
+    'item_res': ITEM_RES,
+}
+STRICT_PARSER['item_alt_re'], STRICT_PARSER['item_alt_groups'] = item_alternation(ITEM_RES)
+ENHANCED_PARSER = {
+    'shop_lines': 15,
+    'shop_re': keyword_pattern(ENHANCED_SHOP_KEYWORDS),
+    'shop_skip_re': keyword_pattern(ENHANCED_SHOP_SKIP_KEYWORDS),
+    'shop_skip_first': True,
+    'item_skip_re': keyword_pattern(ENHANCED_ITEM_SKIP_KEYWORDS),
+    'item_res': ENHANCED_ITEM_RES,
+}
+ENHANCED_PARSER['item_alt_re'], ENHANCED_PARSER['item_alt_groups'] = item_alternation(ENHANCED_ITEM_RES)
+
+# Item categories in priority order
+CATEGORY_KEYWORDS = {
+    'Dairy': [
+        'organic a2', 'a2 milk', 'half & half', 'greek yogurt', 'sour cream', 'cottage cheese',
+        'whole milk', 'skim milk', 'almond milk', 'soy milk', 'oat milk', 'coconut milk',
+        'milk', 'cheese', 'butter', 'yogurt', 'cream', 'dairy', 'mozzarella', 'cheddar',
+        'parmesan', 'swiss', 'feta', 'cream cheese', 'ricotta'
+    ],
+    'Grain': [
+        'whole wheat', 'white bread', 'wheat bread', 'sourdough', 'multigrain',
+        'bread', 'wheat', 'grain', 'flour', 'rice', 'pasta', 'noodle', 'quinoa',
+        'oats', 'cereal', 'bagel', 'tortilla', 'naan', 'roti', 'pita', 'wraps',
+        'buns', 'rolls', 'basmati', 'jasmine rice', 'brown rice', 'white rice'
+    ],
+    'Fruit': [
+        'strawberry', 'blueberry', 'raspberry', 'blackberry', 'cranberry',
+        'pineapple', 'mango', 'avocado', 'grapefruit', 'watermelon', 'cantaloupe',
+        'apple', 'banana', 'orange', 'berry', 'grape', 'fruit', 'fruits',
+        'citrus', 'peach', 'pear', 'plum', 'kiwi', 'lemon', 'lime', 'cherry'
+    ],
+    'Vegetable': [
+        'bell pepper', 'green pepper', 'red pepper', 'broccoli', 'cauliflower', 'cucumber',
+        'lettuce', 'spinach', 'tomato', 'potato', 'onion', 'carrot', 'pepper',
+        'vegetable', 'vegetables', 'veggie', 'veggies', 'garlic', 'ginger', 'celery',
+        'corn', 'peas', 'beans', 'cabbage', 'zucchini', 'squash', 'eggplant',
+        'mushroom', 'asparagus', 'brussels sprouts'
+    ],
+    'Meat & Seafood': [
+        'ground beef', 'ground turkey', 'ground chicken', 'chicken breast', 'chicken thighs',
+        'salmon', 'tuna', 'shrimp', 'crab', 'lobster', 'tilapia', 'cod', 'halibut',
+        'chicken', 'beef', 'pork', 'fish', 'meat', 'seafood', 'turkey', 'lamb',
+        'bacon', 'sausage', 'ham', 'hot dog', 'burger', 'steak', 'ribs'
+    ],
+    'Herb': [
+        'cilantro', 'coriander', 'basil', 'parsley', 'rosemary', 'thyme', 'mint',
+        'oregano', 'sage', 'dill', 'herb', 'herbs', 'chives', 'tarragon'
+    ],
+    'Daal': [
+        'toor dal', 'moong dal', 'chana dal', 'masoor dal', 'urad dal',
+        'daal', 'dal', 'lentil', 'lentils', 'pulse', 'legume'
+    ],
+    'Paste': [
+        'toothpaste', 'tomato paste', 'garlic paste', 'ginger paste', 'curry paste',
+        'paste', 'tooth', 'dental'
+    ],
+    'Pooja item': [
+        'pooja', 'puja', 'incense', 'diya', 'camphor', 'kumkum', 'agarbatti', 'dhoop'
+    ],
+    'Snacks': [
+        'potato chips', 'tortilla chips', 'corn chips', 'pretzel', 'trail mix', 'granola',
+        'chips', 'candy', 'cookies', 'snack', 'snacks', 'chocolate', 'crackers',
+        'nuts', 'almond', 'walnut', 'peanut', 'cashew', 'pistachio'
+    ],
+    'Syrup': [
+        'maple syrup', 'chocolate syrup', 'caramel syrup',
+        'syrup', 'honey', 'molasses', 'agave', 'jam', 'jelly', 'preserve'
+    ],
+    'Body soap': [
+        'body soap', 'hand soap', 'bar soap', 'body wash', 'shower gel', 'liquid soap',
+        'soap', 'bath', 'cleanser'
+    ],
+    'Household': [
+        'dish soap', 'laundry detergent', 'dishwasher detergent', 'trash bag', 'ziploc',
+        'detergent', 'tissue', 'paper', 'cleaner', 'disinfectant', 'bleach',
+        'foil', 'wrap', 'sponge', 'brush', 'towel', 'napkin', 'toilet paper'
+    ],
+    'Beverages': [
+        'orange juice', 'apple juice', 'cranberry juice', 'iced tea', 'green tea',
+        'juice', 'soda', 'water', 'drink', 'coffee', 'tea', 'beer', 'wine',
+        'beverage', 'lemonade', 'smoothie', 'energy drink', 'sports drink'
+    ],
+    'Personal Care': [
+        'hair shampoo', 'body lotion', 'face wash', 'face moisturizer',
+        'shampoo', 'conditioner', 'deodorant', 'lotion', 'moisturizer', 'sunscreen',
+        'razor', 'toothbrush', 'floss', 'mouthwash', 'toner', 'serum', 'cream'
+    ]
+}
+
+def category_pattern(keywords):
+    """Build one regex matching any keyword: multi-word phrases anywhere,
+    single words only on word boundaries"""
+    keywords = sorted(keywords, key=len, reverse=True)
+    phrases = [re.escape(keyword) for keyword in keywords if ' ' in keyword]
+    words = [re.escape(keyword) for keyword in keywords if ' ' not in keyword]
+    return re.compile('|'.join(phrases + [r'\b(?:' + '|'.join(words) + r')\b']))
+
+# One pattern per category, searched in priority order
+CATEGORY_RES = [
+    (category, category_pattern(keywords))
+    for category, keywords in CATEGORY_KEYWORDS.items()
+]
+
+def category_automaton():
+    """Build an Aho-Corasick automaton over all category keywords. Each keyword
+    maps to (category priority, category, keyword length, whole word only)."""
+    automaton = ahocorasick.Automaton()
+    for priority, (category, keywords) in enumerate(CATEGORY_KEYWORDS.items()):
+        for keyword in keywords:
+            # A keyword listed under several categories belongs to the first
+            if keyword not in automaton:
+                automaton.add_word(keyword, (priority, category, len(keyword), ' ' not in keyword))
+    automaton.make_automaton()
+    return automaton
+
+CATEGORY_AUTOMATON = category_automaton() if AHOCORASICK_AVAILABLE else None
+
+def is_word_char(char):
+    """Whether a character counts as a word character for regex word boundaries"""
+    return char.isalnum() or char == '_'
+
+def match_category(name_lower):
+    """Return the first category (in priority order) with a keyword in the name,
+    or None. Single words only match on word boundaries, as in CATEGORY_RES."""
+    if CATEGORY_AUTOMATON is None:
+        for category, pattern in CATEGORY_RES:
+            if pattern.search(name_lower):
+                return category
+        return None
+    
+    # One scan over the name finds every keyword; keep the highest priority
+    best_priority, best_category = len(CATEGORY_KEYWORDS), None
+    for end, (priority, category, length, whole_word) in CATEGORY_AUTOMATON.iter(name_lower):
+        if priority >= best_priority:
+            continue
+        if whole_word:
+            start = end - length + 1
+            if ((start > 0 and is_word_char(name_lower[start - 1])) or
+                    (end + 1 < len(name_lower) and is_word_char(name_lower[end + 1]))):
+                continue
+        best_priority, best_category = priority, category
+    return best_category
+
+@lru_cache(maxsize=4096)
+def categorize_item(item_name):
+    """Categorize item based on name; cached since item names repeat across bills"""
+    if not item_name or len(item_name.strip()) < 2:
+        return 'Uncategorized'
+    
+    name_lower = item_name.lower().strip()
+    
+    # Skip if item name looks like a price, date, or password
+    if (name_lower.replace('.', '').replace(',', '').isdigit() or
+        FULL_DATE_PREFIX_RE.match(name_lower) or
+        QTY_X_PREFIX_RE.match(name_lower) or
+        'password' in name_lower or 'pin' in name_lower):
+        return 'Uncategorized'
+    
+    # First category (in priority order) with any keyword in the name wins
+    return match_category(name_lower) or 'Uncategorized'
+
+# Line items returned by OCRService._mock_extract
+MOCK_LINE_ITEMS = (
+    {
+        'Item Name': 'Milk 2L',
+        'Quantity': 1.0,
+        'Cost per unit': 3.99,
+        'Total amount paid': 3.99,
+        'Item Type': 'Dairy',
+        'Item Sub Type': 'NA'
+    },
+    {
+        'Item Name': 'Bread',
+        'Quantity': 2.0,
+        'Cost per unit': 2.50,
+        'Total amount paid': 5.00,
+        'Item Type': 'Grain',
+        'Item Sub Type': 'NA'
+    },
+    {
+        'Item Name': 'Apple',
+        'Quantity': 1.5,
+        'Cost per unit': 3.99,
+        'Total amount paid': 5.99,
+        'Item Type': 'Fruit',
+        'Item Sub Type': 'NA'
+    }
+)
+
 class OCRService:
     """Service for extracting text and structured data from bill images using OCR"""
     
@@ -28,15 +383,40 @@ class OCRService:
         self.use_tesseract = self._check_tesseract_available()
         self.use_ocr = self.use_easyocr or self.use_tesseract
         
-        # Initialize EasyOCR reader if available
+        # tesserocr API, created on first Tesseract use; it can only read one
+        # image at a time, so calls are serialized by the lock
+        self.use_tesserocr = TESSEROCR_AVAILABLE
+        self.tesseract_api = None
+        self.tesseract_api_lock = threading.Lock()
+        
+        # Initialize EasyOCR reader in the background if available: loading the
+        # models takes seconds, and the first image is preprocessed meanwhile
         if self.use_easyocr:
-            try:
-                print("Initializing EasyOCR...")
-                self.easyocr_reader = easyocr.Reader(['en'], gpu=False)
-                print("EasyOCR initialized successfully")
-            except Exception as e:
-                print(f"EasyOCR initialization failed: {e}, falling back to Tesseract")
-                self.use_easyocr = False
+            loader = ThreadPoolExecutor(max_workers=1)
+            self.easyocr_reader_future = loader.submit(self._load_easyocr_reader)
+            loader.shutdown(wait=False)
+    
+    def _load_easyocr_reader(self):
+        """Create the EasyOCR reader, or return None if initialization fails"""
+        try:
+            print("Initializing EasyOCR...")
+            # quantize: int8 dynamic quantization for faster CPU inference
+            reader = easyocr.Reader(['en'], gpu=False, quantize=True)
+            print("EasyOCR initialized successfully")
+            return reader
+        except Exception as e:
+            print(f"EasyOCR initialization failed: {e}, falling back to Tesseract")
+            return None
+    
+    @property
+    def easyocr_reader(self):
+        """The EasyOCR reader (None if unavailable), waiting for the background load"""
+        if not self.use_easyocr:
+            return None
+        reader = self.easyocr_reader_future.result()
+        if reader is None:
+            self.use_easyocr = False
+        return reader
     
     def _check_easyocr_available(self):
         """Check if EasyOCR is available"""
@@ -44,16 +424,19 @@ class OCRService:
     
     def _check_tesseract_available(self):
         """Check if tesseract is available"""
-        try:
-            pytesseract.get_tesseract_version()
-            return True
-        except:
-            return False
+        return TESSEROCR_AVAILABLE or tesseract_available()
+    
+    def close(self):
+        """Release the tesserocr API, if one was created"""
+        with self.tesseract_api_lock:
+            if self.tesseract_api is not None:
+                self.tesseract_api.End()
+                self.tesseract_api = None
     
     def _preprocess_image(self, image_path):
         """Preprocess image for better OCR accuracy"""
         if not CV2_AVAILABLE:
-            return None
+            return self._preprocess_image_pil(image_path)
         
         try:
             # Read image with OpenCV
@@ -61,11 +444,21 @@ class OCRService:
             if img is None:
                 return None
             
+            # Downscale oversized photos so every later step touches fewer pixels
+            height, width = img.shape[:2]
+            if max(height, width) > PREPROCESS_MAX_EDGE:
+                scale = PREPROCESS_MAX_EDGE / max(height, width)
+                img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            
             # Convert to grayscale
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
             
-            # Apply denoising
-            denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+            # Apply denoising; a 3x3 median is enough for printed receipts,
+            # non-local means is much slower and only used when enabled
+            if NLMEANS_DENOISE:
+                denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+            else:
+                denoised = cv2.medianBlur(gray, 3)
             
             # Increase contrast using CLAHE (Contrast Limited Adaptive Histogram Equalization)
             clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
@@ -79,6 +472,22 @@ class OCRService:
             print(f"Image preprocessing failed: {e}")
             return None
     
+    def _preprocess_image_pil(self, image_path):
+        """Grayscale, denoise and binarize an image with Pillow when OpenCV is
+        not installed. Returns a 1-bit PIL image for Tesseract, or None"""
+        try:
+            image = Image.open(image_path)
+            # Downscale oversized photos, as the OpenCV path does; for JPEGs
+            # thumbnail() also decodes at a reduced scale
+            image.thumbnail((PREPROCESS_MAX_EDGE, PREPROCESS_MAX_EDGE), Image.LANCZOS)
+            gray = image.convert('L')
+            denoised = gray.filter(ImageFilter.MedianFilter(3))
+            threshold = otsu_threshold(denoised.histogram())
+            return denoised.point([0 if level <= threshold else 255 for level in range(256)], '1')
+        except Exception as e:
+            print(f"Image preprocessing failed: {e}")
+            return None
+    
     def extract_from_image(self, image_path):
         """
         Extract bill data from an image file
@@ -88,238 +497,253 @@ class OCRService:
             # Mock implementation for development/demo when OCR is not available
             return self._mock_extract(image_path)
         
-        text = ""
         try:
             # Preprocess image for better OCR
             preprocessed_img = self._preprocess_image(image_path)
             
             # Try EasyOCR first (better accuracy for receipts)
-            if self.use_easyocr and hasattr(self, 'easyocr_reader'):
+            text = None
+            easyocr_reader = self.easyocr_reader
+            if easyocr_reader is not None:
                 try:
                     print("Using EasyOCR for text extraction...")
                     # Use preprocessed image if available, otherwise original
                     if preprocessed_img is not None:
-                        results = self.easyocr_reader.readtext(preprocessed_img)
+                        results = easyocr_reader.readtext(preprocessed_img)
                     else:
-                        results = self.easyocr_reader.readtext(image_path)
-                    
-                    # Combine all detected text
-                    text_lines = []
-                    for (bbox, detected_text, confidence) in results:
-                        if confidence > 0.3:  # Filter low confidence results
-                            text_lines.append(detected_text)
-                    text = '\n'.join(text_lines)
-                    print(f"EasyOCR extracted {len(text_lines)} lines of text")
+                        results = easyocr_reader.readtext(image_path)
+                    text = self._easyocr_text(results)
                 except Exception as e:
                     print(f"EasyOCR failed: {e}, falling back to Tesseract")
-                    text = None
-            
-            # Fallback to Tesseract if EasyOCR failed or not available
-            if not text or len(text.strip()) < 20:
-                print("Using Tesseract for text extraction...")
-                image = Image.open(image_path)
-                
-                # Convert to RGB if necessary
-                if image.mode != 'RGB':
-                    image = image.convert('RGB')
-                
-                # Try OCR with different configurations
-                if preprocessed_img is not None:
-                    # Convert OpenCV image to PIL Image for Tesseract
-                    pil_image = Image.fromarray(preprocessed_img)
-                    text = pytesseract.image_to_string(pil_image, config='--psm 6')
-                else:
-                    text = pytesseract.image_to_string(image, config='--psm 6')
-                
-                # If text is too short, try different page segmentation mode
-                if len(text.strip()) < 50:
-                    text = pytesseract.image_to_string(image, config='--psm 3')
-            
-            if not text or len(text.strip()) < 10:
-                print("OCR extracted insufficient text, using mock data")
-                return self._mock_extract(image_path)
-            
-            print(f"Extracted text length: {len(text)} characters")
-            
-            # Parse extracted text into CSV-like structure
-            parsed_data = self._parse_bill_text_to_csv_format(text)
             
-            # If parsing didn't extract much, try alternative patterns
-            if not parsed_data.get('line_items') or len(parsed_data.get('line_items', [])) < 2:
-                print("Trying enhanced parsing...")
-                parsed_data = self._parse_bill_text_enhanced_to_csv_format(text, image_path)
-            
-            return parsed_data
+            return self._bill_from_text(text, image_path, preprocessed_img)
         except Exception as e:
             # Fallback to mock if OCR fails
             print(f"OCR failed: {str(e)}, using mock data")
             return self._mock_extract(image_path)
     
-    def _parse_bill_text_to_csv_format(self, text):
-        """
-        Parse OCR text and return data in CSV format structure:
-        Returns dict with: Date, Shop Address, and list of items with:
-        Item Name, Quantity, Cost per unit, Total amount paid, Item Type, Item Sub Type
-        """
-        lines = text.split('\n')
+    def _easyocr_text(self, results):
+        """Combine EasyOCR detections into text, dropping low confidence results.
+        Returns None when the detections are too unreliable to use overall."""
+        if not results:
+            return None
+        mean_confidence = sum(confidence for _, _, confidence in results) / len(results)
+        if mean_confidence < EASYOCR_MIN_MEAN_CONFIDENCE:
+            print(f"EasyOCR mean confidence {mean_confidence:.2f} too low")
+            return None
         
-        # Extract shop name (Shop Address)
-        shop_name = "Unknown Shop"
-        for line in lines[:10]:
-            line = line.strip()
-            if line and len(line) > 3:
-                # Check for common shop indicators
-                if any(keyword in line.lower() for keyword in ['store', 'shop', 'mart', 'market', 'supermarket', 'retail', 'grocery', 'costco', 'walmart', 'target', 'safeway', 'kroger']):
-                    shop_name = line
-                    break
-                elif shop_name == "Unknown Shop" and len(line) > 5 and not any(skip in line.lower() for skip in ['date', 'time', 'invoice', 'receipt']):
-                    shop_name = line
+        text_lines = []
+        for (bbox, detected_text, confidence) in results:
+            if confidence > 0.3:  # Filter low confidence results
+                text_lines.append(detected_text)
+        print(f"EasyOCR extracted {len(text_lines)} lines of text")
+        return '\n'.join(text_lines)
+    
+    def _open_image(self, image_path):
+        """Open an image for Tesseract, downscaled like preprocessed images and
+        converted to RGB if Tesseract can't read its mode directly"""
+        image = Image.open(image_path)
+        image.thumbnail((PREPROCESS_MAX_EDGE, PREPROCESS_MAX_EDGE), Image.LANCZOS)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        return image
+    
+    def _tesseract_text(self, image, psm, invert=True):
+        """Run Tesseract once in page segmentation mode psm and rebuild text lines
+        from its confident words. Returns (text, number of words kept)"""
+        words = self._tesserocr_words(image, psm, invert) if self.use_tesserocr else None
+        if words is None:
+            config = f'--psm {psm}' if invert else f'--psm {psm} -c tessedit_do_invert=0'
+            data = pytesseract.image_to_data(image, config=config, output_type=Output.DICT)
+            words = zip(data['block_num'], data['par_num'], data['line_num'], data['text'], data['conf'])
+        lines = {}
+        for block_num, par_num, line_num, word, confidence in words:
+            if confidence > TESSERACT_MIN_CONFIDENCE and word.strip():
+                lines.setdefault((block_num, par_num, line_num), []).append(word)
+        text = '\n'.join(' '.join(words) for words in lines.values())
+        return text, sum(len(words) for words in lines.values())
+    
+    def _tesserocr_words(self, image, psm, invert):
+        """Recognize an image with the long-lived tesserocr API. Returns
+        (block, paragraph, line, word, confidence) tuples like image_to_data,
+        or None if the API can't be initialized"""
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(image)
+        with self.tesseract_api_lock:
+            if self.tesseract_api is None:
+                try:
+                    self.tesseract_api = tesserocr.PyTessBaseAPI()
+                except RuntimeError as e:
+                    print(f"tesserocr initialization failed: {e}, using the tesseract CLI")
+                    self.use_tesserocr = False
+                    return None
+            api = self.tesseract_api
+            api.SetPageSegMode(psm)
+            api.SetVariable('tessedit_do_invert', '1' if invert else '0')
+            api.SetImage(image)
+            tsv = api.GetTSVText(0)
         
-        # Extract date
-        date = datetime.now().date()
-        date_patterns = [
-            r'(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})',  # MM/DD/YYYY or DD/MM/YYYY
-            r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})',  # YYYY/MM/DD
-            r'(\w{3,9})\s+(\d{1,2}),\s+(\d{4})',  # Month DD, YYYY
-        ]
+        # TSV columns: level, page, block, paragraph, line, word, left, top,
+        # width, height, confidence, text
+        words = []
+        for row in tsv.splitlines():
+            fields = row.split('\t', 11)
+            if len(fields) == 12:
+                words.append((int(fields[2]), int(fields[3]), int(fields[4]), fields[11], float(fields[10])))
+        return words
+    
+    def _bill_from_text(self, text, image_path, preprocessed_img):
+        """Parse OCR text into bill data, running Tesseract first if there is no EasyOCR text"""
+        # Fallback to Tesseract if EasyOCR failed, was unsure, or not available.
+        # Short but confident EasyOCR text is kept rather than re-OCRed
+        if text is None:
+            print("Using Tesseract for text extraction...")
+            
+            # Try OCR with different configurations
+            image = None
+            if preprocessed_img is not None:
+                # pytesseract takes the OpenCV array as is; it is already
+                # binarized dark-on-light, so Tesseract needn't try inverting it
+                text, word_count = self._tesseract_text(preprocessed_img, 6, invert=False)
+            else:
+                image = self._open_image(image_path)
+                text, word_count = self._tesseract_text(image, 6)
+            
+            # If too few words were read, try different page segmentation mode
+            if word_count < TESSERACT_MIN_WORDS:
+                if image is None:
+                    image = self._open_image(image_path)
+                text, word_count = self._tesseract_text(image, 3)
         
-        for line in lines:
-            for pattern in date_patterns:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    try:
-                        parts = match.groups()
-                        if len(parts) == 3:
-                            if '/' in line or '-' in line:
-                                if len(parts[0]) == 4:  # YYYY-MM-DD
-                                    year, month, day = parts
-                                    date = datetime(int(year), int(month), int(day)).date()
-                                else:  # MM-DD-YYYY or DD-MM-YYYY
-                                    part1, part2, year_part = parts
-                                    if int(part1) > 12:  # DD-MM-YYYY
-                                        day, month, year = part1, part2, year_part
-                                    else:  # MM-DD-YYYY
-                                        month, day, year = part1, part2, year_part
-                                    if len(year) == 2:
-                                        year = '20' + year
-                                    date = datetime(int(year), int(month), int(day)).date()
-                                break
-                    except:
-                        continue
-            if date != datetime.now().date():
-                break
+        if not text or len(text.strip()) < 10:
+            print("OCR extracted insufficient text, using mock data")
+            return self._mock_extract(image_path)
         
-        # Extract total amount (check last 10 lines)
-        total_amount = 0.0
-        total_patterns = [
-            r'(?:total|grand\s+total|amount\s+due|balance)[:\s]*\$?\s*(\d{1,3}(?:[.,]\d{3})*(?:\.\d{2})?)',
-            r'\$\s*(\d{1,3}(?:[.,]\d{3})*(?:\.\d{2})?)\s*(?:total|due|amount)?',
-        ]
+        print(f"Extracted text length: {len(text)} characters")
         
-        for line in lines[-10:]:
-            for pattern in total_patterns:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    try:
-                        amount_str = match.group(1).replace(',', '').replace(' ', '')
-                        total_amount = float(amount_str)
-                        break
-                    except:
-                        pass
-            if total_amount > 0:
-                break
+        # Parse extracted text into CSV-like structure
+        lines = self._split_lines(text)
+        parsed_data, date_and_total = self._parse_bill_lines(lines, STRICT_PARSER)
         
-        # Extract line items - CSV format: Item Name, Quantity, Cost per unit, Total amount paid, Item Type, Item Sub Type
+        # If parsing didn't extract much, try alternative patterns, reusing the
+        # split lines and the date and total already found
+        if len(parsed_data['line_items']) < 2:
+            print("Trying enhanced parsing...")
+            parsed_data, _ = self._parse_bill_lines(lines, ENHANCED_PARSER, date_and_total)
+        
+        return parsed_data
+    
+    def _split_lines(self, text):
+        """Split OCR text into (raw line, stripped line, lowercased stripped line) tuples"""
+        lines = []
+        for raw_line in text.split('\n'):
+            line = raw_line.strip()
+            lines.append((raw_line, line, line.lower()))
+        return lines
+    
+    def _parse_bill_lines(self, lines, patterns, date_and_total=None):
+        """Parse split OCR lines into CSV format. Returns the parsed bill and the
+        (date, total amount) read from the text, which can be passed back in as
+        date_and_total to skip looking for them again."""
+        today = datetime.now().date()
+        total_start = len(lines) - 10  # Totals are read from the last 10 lines
+        find_date_and_total = date_and_total is None
+        
+        shop_name = "Unknown Shop"
+        shop_found = False
+        date, total_amount = date_and_total or (today, 0.0)
+        # CSV format: Item Name, Quantity, Cost per unit, Total amount paid, Item Type, Item Sub Type
         line_items = []
         
-        for line in lines:
-            line = line.strip()
-            if not line or len(line) < 3:
+        # Single pass: each line is checked for the shop name, date, total and
+        # line item as still needed
+        for index, (raw_line, line, line_lower) in enumerate(lines):
+            # Extract shop name (Shop Address) from the first few lines
+            if index < patterns['shop_lines'] and not shop_found and len(line) > 3:
+                skip_shop = patterns['shop_skip_re'].search(line_lower)
+                # Check for common shop indicators
+                if (patterns['shop_re'].search(line_lower)
+                        and not (skip_shop and patterns['shop_skip_first'])):
+                    shop_name = line
+                    shop_found = True
+                elif shop_name == "Unknown Shop" and len(line) > 5 and not skip_shop:
+                    shop_name = line
+            
+            # Extract date from the first line that has one
+            if find_date_and_total and date == today:
+                date = self._find_date(raw_line) or date
+            
+            # Extract total amount
+            if find_date_and_total and index >= total_start and total_amount == 0:
+                amount = self._find_total(raw_line)
+                if amount is not None:
+                    total_amount = amount
+            
+            # Extract line items
+            if len(line) < 3:
                 continue
             
             # Skip header/footer/common lines
-            skip_keywords = ['item', 'description', 'qty', 'quantity', 'price', 'total', 'subtotal', 
-                           'tax', 'receipt', 'invoice', 'date', 'time', 'cashier', 'register',
-                           'password', 'pin', 'card', 'signature', 'thank', 'visit', 'change',
-                           'cash', 'tendered', 'balance', 'discount', 'coupon', 'voucher',
-                           'refund', 'return', 'exchange', 'void', 'cancelled', 'transaction']
-            if any(skip in line.lower() for skip in skip_keywords):
+            if patterns['item_skip_re'].search(line_lower):
                 continue
             
             # Skip lines that look like passwords or PINs
-            if re.match(r'^\d+(\.\d+)?[xX]\s*\$?\s*\d+', line):
+            if SKIP_QTY_X_RE.match(line):
                 continue
             
             # Skip purely numeric lines
-            if re.match(r'^\s*\$?\s*\d{1,2}(?:[.,]\d{3})*(?:\.\d{2})?\s*$', line):
+            if SKIP_NUMERIC_RE.match(line):
                 continue
             
             # Patterns to match line items with prices
-            patterns = [
-                r'^(.+?)\s+\$?\s*(\d+\.?\d{2})\s*$',  # Item $price
-                r'^(.+?)\s+x?\s*(\d+(?:\.\d+)?)\s+\$?(\d+\.?\d{2})$',  # Item x2 $price
-                r'^(.+?)\s+(\d+\.?\d{2})\s*\$?\s*$',  # Item price
-                r'^(.+?)\s+(\d+)\s+x\s+\$?(\d+\.?\d{2})$',  # Item 2 x $price
-            ]
-            
-            for pattern in patterns:
-                match = re.match(pattern, line, re.IGNORECASE)
-                if match:
-                    try:
-                        groups = match.groups()
-                        item_name = groups[0].strip()
-                        
-                        # Skip if item name looks invalid
-                        if (item_name.replace('.', '').replace(',', '').isdigit() or 
-                            re.match(r'^\d{1,2}[/-]', item_name) or
-                            len(item_name) < 2):
-                            continue
-                        
-                        # Extract quantity and price
-                        quantity = 1.0
-                        item_price = 0.0  # Cost per unit
-                        item_total = 0.0  # Total amount paid
-                        
-                        if len(groups) == 3:  # Has quantity and price
-                            try:
-                                quantity = float(groups[1])
-                                price_str = groups[2].replace(',', '')
-                                item_price = float(price_str)
-                                item_total = item_price * quantity
-                            except:
-                                continue
-                        elif len(groups) == 2:  # Just price (quantity = 1)
-                            try:
-                                val_str = groups[1].replace(',', '')
-                                if '.' in val_str:
-                                    item_price = float(val_str)
-                                    item_total = item_price
-                                else:
-                                    continue
-                            except:
-                                continue
-                        
-                        # Validate price is reasonable
-                        if item_price <= 0 or item_price >= 1000 or item_total >= 1000:
+            for groups in self._item_matches(line, patterns):
+                try:
+                    item_name = groups[0].strip()
+                    
+                    # Skip if item name looks invalid
+                    if (item_name.replace('.', '').replace(',', '').isdigit() or 
+                        DATE_PREFIX_RE.match(item_name) or
+                        len(item_name) < 2):
+                        continue
+                    
+                    # Extract quantity and price
+                    quantity = 1.0
+                    item_price = 0.0  # Cost per unit
+                    item_total = 0.0  # Total amount paid
+                    
+                    if len(groups) == 3:  # Has quantity and price
+                        quantity = float(groups[1])
+                        item_price = parse_price(groups[2])
+                        item_total = item_price * quantity
+                    elif len(groups) == 2:  # Just price (quantity = 1)
+                        if '.' not in groups[1]:
                             continue
-                        
-                        # Categorize item
-                        category = self._categorize_item(item_name)
-                        item_type = category  # Item Type = category
-                        item_sub_type = 'NA'  # Item Sub Type (can be enhanced later)
-                        
-                        # Add to line items in CSV format
-                        line_items.append({
-                            'Item Name': item_name,
-                            'Quantity': quantity,
-                            'Cost per unit': item_price,
-                            'Total amount paid': item_total,
-                            'Item Type': item_type,
-                            'Item Sub Type': item_sub_type
-                        })
-                        break
-                    except Exception as e:
+                        item_price = parse_price(groups[1])
+                        item_total = item_price
+                    
+                    # Validate price is reasonable
+                    if item_price <= 0 or item_price >= 1000 or item_total >= 1000:
                         continue
+                    
+                    # Categorize item
+                    category = self._categorize_item(item_name)
+                    item_type = category  # Item Type = category
+                    item_sub_type = 'NA'  # Item Sub Type (can be enhanced later)
+                    
+                    # Add to line items in CSV format
+                    line_items.append({
+                        'Item Name': item_name,
+                        'Quantity': quantity,
+                        'Cost per unit': item_price,
+                        'Total amount paid': item_total,
+                        'Item Type': item_type,
+                        'Item Sub Type': item_sub_type
+                    })
+                    break
+                except ValueError:
+                    continue
+        
+        date_and_total = (date, total_amount)
         
         # Calculate total from items if we have line items
         if line_items and total_amount == 0:
@@ -330,302 +754,90 @@ class OCRService:
             'Shop Address': shop_name,
             'line_items': line_items,
             'total_amount': total_amount
-        }
+        }, date_and_total
     
-    def _parse_bill_text_enhanced_to_csv_format(self, text, image_path=None):
-        """Enhanced parsing with more flexible patterns, returns CSV format"""
-        lines = text.split('\n')
-        
-        shop_name = "Unknown Shop"
-        for line in lines[:15]:
-            line = line.strip()
-            if line and len(line) > 3:
-                if any(skip in line.lower() for skip in ['date', 'time', 'invoice', 'receipt', 'total', 'subtotal']):
+    def _item_matches(self, line, patterns):
+        """Yield the groups of each line item pattern that matches the line, in
+        pattern order. Plain "name price" lines are split without regexes, others
+        go through one alternation to find the first match; the remaining
+        patterns are only tried if the caller rejects it."""
+        groups = split_item_price(line)
+        if groups:
+            index = 0
+        else:
+            match = patterns['item_alt_re'].match(line)
+            if not match:
+                return
+            index = int(match.lastgroup[len('item'):])
+            groups = match.group(*patterns['item_alt_groups'][index])
+        yield groups
+        for pattern in patterns['item_res'][index + 1:]:
+            match = pattern.match(line)
+            if match:
+                yield match.groups()
+    
+    def _find_date(self, line):
+        """Return the date in a line of OCR text, or None"""
+        for pattern in DATE_RES:
+            match = pattern.search(line)
+            if match:
+                try:
+                    parts = match.groups()
+                    if '/' in line or '-' in line:
+                        if len(parts[0]) == 4:  # YYYY-MM-DD
+                            year, month, day = parts
+                        else:  # MM-DD-YYYY or DD-MM-YYYY
+                            part1, part2, year = parts
+                            if int(part1) > 12:  # DD-MM-YYYY
+                                day, month = part1, part2
+                            else:  # MM-DD-YYYY
+                                month, day = part1, part2
+                            if len(year) == 2:
+                                year = '20' + year
+                        return datetime(int(year), int(month), int(day)).date()
+                except ValueError:  # Not numeric, or not a valid date
                     continue
-                if any(keyword in line.lower() for keyword in ['store', 'shop', 'mart', 'market', 'supermarket', 'retail', 'grocery']):
-                    shop_name = line
-                    break
-                elif shop_name == "Unknown Shop" and len(line) > 5:
-                    shop_name = line
-        
-        date = datetime.now().date()
-        date_patterns = [
-            r'(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})',
-            r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})',
-            r'(\w{3,9})\s+(\d{1,2}),\s+(\d{4})',
-        ]
-        
-        for line in lines:
-            for pattern in date_patterns:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match and len(match.groups()) == 3:
-                    try:
-                        parts = match.groups()
-                        if '/' in line or '-' in line:
-                            if len(parts[0]) == 4:
-                                year, month, day = parts
-                                date = datetime(int(year), int(month), int(day)).date()
-                            else:
-                                part1, part2, year_part = parts
-                                if int(part1) > 12:
-                                    day, month, year = part1, part2, year_part
-                                else:
-                                    month, day, year = part1, part2, year_part
-                                if len(year) == 2:
-                                    year = '20' + year
-                                date = datetime(int(year), int(month), int(day)).date()
-                            break
-                    except:
-                        continue
-            if date != datetime.now().date():
-                break
-        
-        total_amount = 0.0
-        total_patterns = [
-            r'(?:total|grand\s+total|amount\s+due|balance)[:\s]*\$?\s*(\d{1,3}(?:[.,]\d{3})*(?:\.\d{2})?)',
-            r'\$\s*(\d{1,3}(?:[.,]\d{3})*(?:\.\d{2})?)\s*(?:total|due|amount)?',
-        ]
-        
-        for line in lines[-10:]:
-            for pattern in total_patterns:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    try:
-                        amount_str = match.group(1).replace(',', '').replace(' ', '')
-                        total_amount = float(amount_str)
-                        break
-                    except:
-                        pass
-            if total_amount > 0:
-                break
-        
-        line_items = []
-        
-        for line in lines:
-            line = line.strip()
-            if not line or len(line) < 3:
-                continue
-            
-            skip_keywords = ['item', 'description', 'qty', 'quantity', 'price', 'total', 'subtotal', 
-                           'tax', 'receipt', 'invoice', 'date', 'time', 'password', 'pin', 'card',
-                           'signature', 'thank', 'visit', 'change', 'cash', 'tendered', 'balance']
-            if any(skip in line.lower() for skip in skip_keywords):
-                continue
-            
-            if re.match(r'^\d+(\.\d+)?[xX]\s*\$?\s*\d+', line):
-                continue
-            
-            if re.match(r'^\s*\$?\s*\d{1,2}(?:[.,]\d{3})*(?:\.\d{2})?\s*$', line):
-                continue
-            
-            patterns = [
-                r'^(.+?)\s+\$?\s*(\d+\.?\d{2})\s*$',
-                r'^(.+?)\s+x?\s*(\d+)\s+\$?(\d+\.?\d{2})$',
-                r'^(.+?)\s+(\d+\.?\d{2})\s*\$?\s*$',
-                r'^(.+?)\s+(\d+)\s+x\s+\$?(\d+\.?\d{2})$',
-            ]
-            
-            for pattern in patterns:
-                match = re.match(pattern, line, re.IGNORECASE)
-                if match:
-                    try:
-                        groups = match.groups()
-                        item_name = groups[0].strip()
-                        
-                        if (item_name.replace('.', '').replace(',', '').isdigit() or 
-                            re.match(r'^\d{1,2}[/-]', item_name) or len(item_name) < 2):
-                            continue
-                        
-                        quantity = 1.0
-                        item_price = 0.0
-                        item_total = 0.0
-                        
-                        if len(groups) == 3:
-                            try:
-                                quantity = float(groups[1])
-                                price_str = groups[2].replace(',', '')
-                                item_price = float(price_str)
-                                item_total = item_price * quantity
-                            except:
-                                continue
-                        elif len(groups) == 2:
-                            try:
-                                val_str = groups[1].replace(',', '')
-                                if '.' in val_str:
-                                    item_price = float(val_str)
-                                    item_total = item_price
-                                else:
-                                    continue
-                            except:
-                                continue
-                        
-                        if item_price <= 0 or item_price >= 1000 or item_total >= 1000:
-                            continue
-                        
-                        category = self._categorize_item(item_name)
-                        
-                        line_items.append({
-                            'Item Name': item_name,
-                            'Quantity': quantity,
-                            'Cost per unit': item_price,
-                            'Total amount paid': item_total,
-                            'Item Type': category,
-                            'Item Sub Type': 'NA'
-                        })
-                        break
-                    except:
-                        continue
-        
-        if line_items and total_amount == 0:
-            total_amount = sum(item['Total amount paid'] for item in line_items)
-        
-        return {
-            'Date': date.isoformat(),
-            'Shop Address': shop_name,
-            'line_items': line_items,
-            'total_amount': total_amount
-        }
+        return None
+    
+    def _find_total(self, line):
+        """Return the total amount in a line of OCR text, or None"""
+        for pattern in TOTAL_RES:
+            match = pattern.search(line)
+            if match:
+                try:
+                    amount_str = match.group(1).replace(',', '').replace(' ', '')
+                    return float(amount_str)
+                except ValueError:  # e.g. "1.234.56"
+                    pass
+        return None
     
     def _categorize_item(self, item_name):
         """Categorize item based on name"""
-        if not item_name or len(item_name.strip()) < 2:
-            return 'Uncategorized'
-        
-        name_lower = item_name.lower().strip()
-        
-        # Skip if item name looks like a price, date, or password
-        if (name_lower.replace('.', '').replace(',', '').isdigit() or
-            re.match(r'^\d{1,2}[/-]\d{1,2}[/-]\d{2,4}', name_lower) or
-            re.match(r'^\d+(\.\d+)?[xX]', name_lower) or
-            'password' in name_lower or 'pin' in name_lower):
-            return 'Uncategorized'
-        
-        # More comprehensive categorization with priority order
-        categories = {
-            'Dairy': [
-                'organic a2', 'a2 milk', 'half & half', 'greek yogurt', 'sour cream', 'cottage cheese',
-                'whole milk', 'skim milk', 'almond milk', 'soy milk', 'oat milk', 'coconut milk',
-                'milk', 'cheese', 'butter', 'yogurt', 'cream', 'dairy', 'mozzarella', 'cheddar',
-                'parmesan', 'swiss', 'feta', 'cream cheese', 'ricotta'
-            ],
-            'Grain': [
-                'whole wheat', 'white bread', 'wheat bread', 'sourdough', 'multigrain',
-                'bread', 'wheat', 'grain', 'flour', 'rice', 'pasta', 'noodle', 'quinoa',
-                'oats', 'cereal', 'bagel', 'tortilla', 'naan', 'roti', 'pita', 'wraps',
-                'buns', 'rolls', 'basmati', 'jasmine rice', 'brown rice', 'white rice'
-            ],
-            'Fruit': [
-                'strawberry', 'blueberry', 'raspberry', 'blackberry', 'cranberry',
-                'pineapple', 'mango', 'avocado', 'grapefruit', 'watermelon', 'cantaloupe',
-                'apple', 'banana', 'orange', 'berry', 'grape', 'fruit', 'fruits',
-                'citrus', 'peach', 'pear', 'plum', 'kiwi', 'lemon', 'lime', 'cherry'
-            ],
-            'Vegetable': [
-                'bell pepper', 'green pepper', 'red pepper', 'broccoli', 'cauliflower', 'cucumber',
-                'lettuce', 'spinach', 'tomato', 'potato', 'onion', 'carrot', 'pepper',
-                'vegetable', 'vegetables', 'veggie', 'veggies', 'garlic', 'ginger', 'celery',
-                'corn', 'peas', 'beans', 'cabbage', 'zucchini', 'squash', 'eggplant',
-                'mushroom', 'asparagus', 'brussels sprouts'
-            ],
-            'Meat & Seafood': [
-                'ground beef', 'ground turkey', 'ground chicken', 'chicken breast', 'chicken thighs',
-                'salmon', 'tuna', 'shrimp', 'crab', 'lobster', 'tilapia', 'cod', 'halibut',
-                'chicken', 'beef', 'pork', 'fish', 'meat', 'seafood', 'turkey', 'lamb',
-                'bacon', 'sausage', 'ham', 'hot dog', 'burger', 'steak', 'ribs'
-            ],
-            'Herb': [
-                'cilantro', 'coriander', 'basil', 'parsley', 'rosemary', 'thyme', 'mint',
-                'oregano', 'sage', 'dill', 'herb', 'herbs', 'chives', 'tarragon'
-            ],
-            'Daal': [
-                'toor dal', 'moong dal', 'chana dal', 'masoor dal', 'urad dal',
-                'daal', 'dal', 'lentil', 'lentils', 'pulse', 'legume'
-            ],
-            'Paste': [
-                'toothpaste', 'tomato paste', 'garlic paste', 'ginger paste', 'curry paste',
-                'paste', 'tooth', 'dental'
-            ],
-            'Pooja item': [
-                'pooja', 'puja', 'incense', 'diya', 'camphor', 'kumkum', 'agarbatti', 'dhoop'
-            ],
-            'Snacks': [
-                'potato chips', 'tortilla chips', 'corn chips', 'pretzel', 'trail mix', 'granola',
-                'chips', 'candy', 'cookies', 'snack', 'snacks', 'chocolate', 'crackers',
-                'nuts', 'almond', 'walnut', 'peanut', 'cashew', 'pistachio'
-            ],
-            'Syrup': [
-                'maple syrup', 'chocolate syrup', 'caramel syrup',
-                'syrup', 'honey', 'molasses', 'agave', 'jam', 'jelly', 'preserve'
-            ],
-            'Body soap': [
-                'body soap', 'hand soap', 'bar soap', 'body wash', 'shower gel', 'liquid soap',
-                'soap', 'bath', 'cleanser'
-            ],
-            'Household': [
-                'dish soap', 'laundry detergent', 'dishwasher detergent', 'trash bag', 'ziploc',
-                'detergent', 'tissue', 'paper', 'cleaner', 'disinfectant', 'bleach',
-                'foil', 'wrap', 'sponge', 'brush', 'towel', 'napkin', 'toilet paper'
-            ],
-            'Beverages': [
-                'orange juice', 'apple juice', 'cranberry juice', 'iced tea', 'green tea',
-                'juice', 'soda', 'water', 'drink', 'coffee', 'tea', 'beer', 'wine',
-                'beverage', 'lemonade', 'smoothie', 'energy drink', 'sports drink'
-            ],
-            'Personal Care': [
-                'hair shampoo', 'body lotion', 'face wash', 'face moisturizer',
-                'shampoo', 'conditioner', 'deodorant', 'lotion', 'moisturizer', 'sunscreen',
-                'razor', 'toothbrush', 'floss', 'mouthwash', 'toner', 'serum', 'cream'
-            ]
-        }
-        
-        # Try matching from longest to shortest keywords for better specificity
-        for category, keywords in categories.items():
-            sorted_keywords = sorted(keywords, key=len, reverse=True)
-            for keyword in sorted_keywords:
-                if ' ' in keyword:
-                    if keyword in name_lower:
-                        return category
-                else:
-                    pattern = r'\b' + re.escape(keyword) + r'\b'
-                    if re.search(pattern, name_lower):
-                        return category
-        
-        return 'Uncategorized'
+        return categorize_item(item_name)
     
     def _mock_extract(self, image_path):
         """Mock extraction for development/demo when OCR is not available"""
-        filename = os.path.basename(image_path)
-        date = datetime.now().date()
-        
-        # Return in CSV format structure
+        # Return in CSV format structure; items are copied so callers can't
+        # change the shared mock data
         return {
-            'Date': date.isoformat(),
+            'Date': datetime.now().date().isoformat(),
             'Shop Address': 'Sample Store',
-            'line_items': [
-                {
-                    'Item Name': 'Milk 2L',
-                    'Quantity': 1.0,
-                    'Cost per unit': 3.99,
-                    'Total amount paid': 3.99,
-                    'Item Type': 'Dairy',
-                    'Item Sub Type': 'NA'
-                },
-                {
-                    'Item Name': 'Bread',
-                    'Quantity': 2.0,
-                    'Cost per unit': 2.50,
-                    'Total amount paid': 5.00,
-                    'Item Type': 'Grain',
-                    'Item Sub Type': 'NA'
-                },
-                {
-                    'Item Name': 'Apple',
-                    'Quantity': 1.5,
-                    'Cost per unit': 3.99,
-                    'Total amount paid': 5.99,
-                    'Item Type': 'Fruit',
-                    'Item Sub Type': 'NA'
-                }
-            ],
+            'line_items': [dict(item) for item in MOCK_LINE_ITEMS],
             'total_amount': 14.98
         }
+
+# Shared OCRService: it holds no per-request state, and creating one loads the
+# EasyOCR models, so request handlers should use get_ocr_service()
+ocr_service = None
+ocr_service_lock = threading.Lock()
+
+def get_ocr_service():
+    """Get the shared OCRService, creating it on first use"""
+    global ocr_service
+    if ocr_service is None:
+        with ocr_service_lock:
+            if ocr_service is None:
+                ocr_service = OCRService()
+                # Release the tesserocr API when the process exits
+                atexit.register(ocr_service.close)
+    return ocr_service
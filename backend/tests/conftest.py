@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.py reads its configuration at import, so point it at a scratch
+# database and upload folder before any test module imports it
+TEST_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f'sqlite:///{TEST_DIR}/bills.db'
+os.environ['UPLOAD_FOLDER'] = os.path.join(TEST_DIR, 'uploads')
+os.environ['DATA_DIR'] = os.path.join(TEST_DIR, 'data')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def client():
+    """Test client on an empty database"""
+    import app as app_module
+    client = app_module.app.test_client()
+    yield client
+    client.delete('/api/bills')
@@ -0,0 +1,148 @@
+import io
+import time
+
+import app as app_module
+
+BILLS_CSV = '''shop_name,date,total_amount,line_items
+Walmart,2024-01-15,10.49,"Milk 2L,1,3.99,Dairy|Bread,2,3.25,Grain"
+Target,2024-01-16,6.75,"Shampoo,1,6.75,Personal Care"
+'''
+
+# Line item format; without a cost per unit the price is total / quantity
+LINE_ITEMS_CSV = '''Date,Shop Address,Item Name,Quantity,Cost per unit,Total amount paid,Item Type
+03/05/2024,Corner Shop,Apples,3,,1.00,Fruit
+03/05/2024,Corner Shop,Pears,1,,0.10,Fruit
+03/05/2024,Corner Shop,Plums,1,,0.20,Fruit
+'''
+
+OCR_BILL = {
+    'Date': '2024-02-10',
+    'Shop Address': 'Sample Store',
+    'line_items': [{
+        'Item Name': 'Milk 2L',
+        'Quantity': 1.0,
+        'Cost per unit': 3.99,
+        'Total amount paid': 3.99,
+        'Item Type': 'Dairy',
+        'Item Sub Type': 'NA'
+    }],
+    'total_amount': 3.99
+}
+
+class StubOCRService:
+    def extract_from_image(self, image_path):
+        return OCR_BILL
+
+def upload_csv(client, content, name='bills.csv'):
+    return client.post('/api/bills/upload-csv', data={'file': (io.BytesIO(content.encode()), name)},
+                       content_type='multipart/form-data')
+
+def upload_image(client):
+    return client.post('/api/bills/upload-image', data={'file': (io.BytesIO(b'image'), 'image.jpg')},
+                       content_type='multipart/form-data')
+
+def wait_for_job(client, job_id, timeout=10):
+    """Poll an upload job until it finishes, returning the final response"""
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get(f'/api/bills/job/{job_id}')
+        if response.status_code != 202 or time.monotonic() > deadline:
+            return response
+        time.sleep(0.01)
+
+def test_csv_upload_skips_duplicates(client):
+    response = upload_csv(client, BILLS_CSV)
+    assert response.status_code == 201
+    assert response.get_json()['bills_created'] == 2
+    
+    response = upload_csv(client, BILLS_CSV)
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['bills_created'] == 0
+    assert len(body['errors']) == 2
+    assert all('Duplicate bill skipped' in error for error in body['errors'])
+    
+    bills = client.get('/api/bills').get_json()['bills']
+    assert sorted(bill['shop_name'] for bill in bills) == ['Target', 'Walmart']
+
+def test_image_upload_job_lifecycle(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'get_ocr_service', StubOCRService)
+    
+    response = upload_image(client)
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    
+    response = wait_for_job(client, job_id)
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['status'] == 'completed'
+    assert body['shop_name'] == 'Sample Store'
+    assert body['total_amount'] == 3.99
+    
+    # A finished job can be polled again until it expires
+    assert client.get(f'/api/bills/job/{job_id}').get_json() == body
+    
+    # The same bill again is a duplicate
+    duplicate_job_id = upload_image(client).get_json()['job_id']
+    response = wait_for_job(client, duplicate_job_id)
+    assert response.status_code == 409
+    assert response.get_json()['total_amount'] == 3.99
+    
+    monkeypatch.setattr(app_module, 'OCR_JOB_TTL', -1)
+    assert client.get(f'/api/bills/job/{job_id}').status_code == 404
+
+def test_amounts_are_rounded_to_cents(client):
+    assert upload_csv(client, LINE_ITEMS_CSV).status_code == 201
+    
+    bill, = client.get('/api/bills').get_json()['bills']
+    assert bill['total_amount'] == 1.3
+    prices = {item['name']: item['price'] for item in bill['line_items']}
+    assert prices == {'Apples': 0.33, 'Pears': 0.1, 'Plums': 0.2}
+    
+    analysis = client.get('/api/analysis/monthly?month=3&year=2024').get_json()
+    assert analysis['total_spent'] == 1.3
+    assert analysis['shops'] == [{'shop_name': 'Corner Shop', 'bill_count': 1, 'total_spent': 1.3}]
+    assert analysis['categories'] == [{'category': 'Fruit', 'item_count': 3, 'total_spent': 1.3}]
+    assert analysis['top_items'][0] == {
+        'item_name': 'Apples', 'total_quantity': 3.0, 'total_spent': 1.0, 'purchase_count': 1
+    }
+    
+    summary = client.get('/api/analysis/summary?month=3&year=2024').get_json()
+    assert summary['total_spent'] == 1.3
+
+def test_whole_amounts_are_returned_as_floats(client):
+    upload_csv(client, LINE_ITEMS_CSV.splitlines()[0] + '\n03/05/2024,Corner Shop,Apples,3,1,3,Fruit\n')
+    
+    bill, = client.get('/api/bills').get_json()['bills']
+    item, = bill['line_items']
+    values = [bill['total_amount'], item['quantity'], item['price']]
+    assert values == [3.0, 3.0, 1.0]
+    assert all(isinstance(value, float) for value in values)
+
+def test_delete_invalidates_cached_analysis(client):
+    upload_csv(client, BILLS_CSV)
+    assert client.get('/api/analysis/summary').get_json()['total_bills'] == 2
+    assert client.get('/api/analysis/monthly?month=1&year=2024').get_json()['total_bills'] == 2
+    
+    assert client.delete('/api/bills').status_code == 200
+    assert client.get('/api/analysis/summary').get_json()['total_bills'] == 0
+    assert client.get('/api/analysis/monthly?month=1&year=2024').get_json()['total_bills'] == 0
+
+def test_out_of_range_dates_match_no_bills(client):
+    upload_csv(client, BILLS_CSV)
+    for query in ('month=13&year=2024', 'month=-1&year=2024', 'year=10000', 'month=1&year=-5'):
+        response = client.get(f'/api/bills?{query}')
+        assert response.status_code == 200
+        assert response.get_json()['bills'] == []
+        
+        response = client.get(f'/api/analysis/summary?{query}')
+        assert response.status_code == 200
+        assert response.get_json()['total_bills'] == 0
+    
+    for query in ('month=13&year=2024', 'month=1&year=10000', 'month=12&year=9999'):
+        response = client.get(f'/api/analysis/monthly?{query}')
+        assert response.status_code == 200
+        assert response.get_json()['total_bills'] == 0
+    
+    # Month 0 isn't a filter, as before
+    assert len(client.get('/api/bills?month=0&year=2024').get_json()['bills']) == 2
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+import pytest
+
+from app import parse_csv_date
+
+# The strptime formats parse_csv_date replaced, tried in this order
+STRPTIME_FORMATS = ['%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d', '%d/%m/%Y']
+
+def strptime_date(date_str):
+    for date_format in STRPTIME_FORMATS:
+        try:
+            return datetime.strptime(date_str, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+@pytest.mark.parametrize('date_str', [
+    '12/31/2024', '1/5/2024', '01/05/2024', '13/05/2024', '31/12/2024', '2/29/2024',
+    '2/29/2023', '02/30/2024', '00/10/2024', '10/00/2024', '001/02/2024', '01/02/024',
+    '01/02/24', '12/13/24', '13/12/24', '1/2/68', '1/2/69', '2024-03-09', '2024-3-9',
+    '2024-02-30', '24-03-09', '2024/03/09', '03-09-2024', '', 'not a date', '1/2/2024x',
+])
+def test_parse_csv_date_matches_strptime(date_str):
+    assert parse_csv_date(date_str) == strptime_date(date_str)
+
+def test_parse_csv_date_prefers_month_first():
+    assert parse_csv_date('02/09/2025') == datetime(2025, 2, 9).date()
+    assert parse_csv_date('15/02/2025') == datetime(2025, 2, 15).date()
+    assert parse_csv_date('02/09/25') == datetime(2025, 2, 9).date()
+    assert parse_csv_date('2/15/99') == datetime(1999, 2, 15).date()
@@ -0,0 +1,235 @@
+from datetime import date
+
+import pytest
+
+from services import ocr_service
+from services.ocr_service import ENHANCED_PARSER, ITEM_RES, STRICT_PARSER, OCRService, split_item_price
+
+TODAY = date.today().isoformat()
+
+# Sample OCR text; a receipt without a readable date is dated today
+RECEIPTS = {
+    'grocery': '''WALMART SUPERCENTER
+123 Main St, Springfield
+Date: 01/15/2024 10:32
+Milk 2L 3.99
+Whole Wheat Bread $2.49
+Bananas 2 x 0.59
+Chicken Breast x2 $7.50
+Cheddar Cheese 4.25 $
+Shampoo 6.75
+SUBTOTAL 25.57
+TAX 0.45
+TOTAL $26.02
+CASH 30.00
+CHANGE 3.98
+THANK YOU FOR SHOPPING''',
+    'single_item': '''Corner Cafe
+Receipt #1042
+25/12/2023
+Coffee Beans 12.99
+Balance due $12.99''',
+    'iso_date': '''Fresh Foods Co
+Order 2024-03-09
+Tomato 1.20
+Basmati Rice 5kg 11.49
+Pooja Incense 2.00
+Paper Towels 3 4.50
+Amount due 1,234.56''',
+    'noise': '''Sunrise Deli
+Cashier: Sam
+03/04 Special 5.00
+12x 3456
+   $ 9.99
+TV 1500.00
+Hot Dog 2.50
+Sparkling Water 1.25
+Card ending 4242
+$ 3.75 total''',
+    'short_year': '''Green Valley Market
+12-05-23
+Lettuce 1.49
+Ginger Tea 3.99''',
+    'enhanced_fallback': '''Receipt Mart
+Kroger Plaza
+Eggs 1.5 $350
+Discount Bread 2.00
+Coupon Savings 1.00
+Total 4.00''',
+    'month_name': '''Daily Needs Store
+Jan 5, 2024
+Toilet Paper 8.99
+Dish Soap 2.99
+Total 11.98''',
+}
+
+# What the original strict and enhanced parsers returned for RECEIPTS, as
+# (date, shop, total amount, [(item, quantity, unit price, total paid, type)])
+STRICT = {
+    'grocery': ('2024-01-15', 'WALMART SUPERCENTER', 7.5, [
+        ('Milk 2L', 1.0, 3.99, 3.99, 'Dairy'),
+        ('Whole Wheat Bread', 1.0, 2.49, 2.49, 'Grain'),
+        ('Bananas 2 x', 1.0, 0.59, 0.59, 'Uncategorized'),
+        ('Chicken Breast x2', 1.0, 7.5, 7.5, 'Meat & Seafood'),
+        ('Cheddar Cheese', 1.0, 4.25, 4.25, 'Dairy'),
+        ('Shampoo', 1.0, 6.75, 6.75, 'Personal Care'),
+    ]),
+    'single_item': ('2023-12-25', 'Corner Cafe', 12.99, [
+        ('Coffee Beans', 1.0, 12.99, 12.99, 'Vegetable'),
+    ]),
+    'iso_date': ('2009-03-24', 'Fresh Foods Co', 1234.56, [
+        ('Tomato', 1.0, 1.2, 1.2, 'Vegetable'),
+        ('Basmati Rice 5kg', 1.0, 11.49, 11.49, 'Grain'),
+        ('Pooja Incense', 1.0, 2.0, 2.0, 'Pooja item'),
+        ('Paper Towels 3', 1.0, 4.5, 4.5, 'Household'),
+    ]),
+    'noise': (TODAY, 'Sunrise Deli', 9.99, [
+        ('Hot Dog', 1.0, 2.5, 2.5, 'Meat & Seafood'),
+        ('Sparkling Water', 1.0, 1.25, 1.25, 'Beverages'),
+    ]),
+    'short_year': ('2023-12-05', 'Green Valley Market', 5.48, [
+        ('Lettuce', 1.0, 1.49, 1.49, 'Vegetable'),
+        ('Ginger Tea', 1.0, 3.99, 3.99, 'Vegetable'),
+    ]),
+    'enhanced_fallback': (TODAY, 'Receipt Mart', 350.0, [
+        ('Eggs', 1.5, 350.0, 525.0, 'Uncategorized'),
+    ]),
+    'month_name': (TODAY, 'Daily Needs Store', 11.98, [
+        ('Toilet Paper', 1.0, 8.99, 8.99, 'Household'),
+        ('Dish Soap', 1.0, 2.99, 2.99, 'Body soap'),
+    ]),
+}
+
+ENHANCED = {
+    'grocery': ('2024-01-15', 'WALMART SUPERCENTER', 7.5, [
+        ('Milk 2L', 1.0, 3.99, 3.99, 'Dairy'),
+        ('Whole Wheat Bread', 1.0, 2.49, 2.49, 'Grain'),
+        ('Bananas 2 x', 1.0, 0.59, 0.59, 'Uncategorized'),
+        ('Chicken Breast x2', 1.0, 7.5, 7.5, 'Meat & Seafood'),
+        ('Cheddar Cheese', 1.0, 4.25, 4.25, 'Dairy'),
+        ('Shampoo', 1.0, 6.75, 6.75, 'Personal Care'),
+    ]),
+    'single_item': ('2023-12-25', 'Corner Cafe', 12.99, [
+        ('Coffee Beans', 1.0, 12.99, 12.99, 'Vegetable'),
+    ]),
+    'iso_date': ('2009-03-24', 'Fresh Foods Co', 1234.56, [
+        ('Tomato', 1.0, 1.2, 1.2, 'Vegetable'),
+        ('Basmati Rice 5kg', 1.0, 11.49, 11.49, 'Grain'),
+        ('Pooja Incense', 1.0, 2.0, 2.0, 'Pooja item'),
+        ('Paper Towels 3', 1.0, 4.5, 4.5, 'Household'),
+    ]),
+    'noise': (TODAY, 'Sunrise Deli', 9.99, [
+        ('Hot Dog', 1.0, 2.5, 2.5, 'Meat & Seafood'),
+        ('Sparkling Water', 1.0, 1.25, 1.25, 'Beverages'),
+    ]),
+    'short_year': ('2023-12-05', 'Green Valley Market', 5.48, [
+        ('Lettuce', 1.0, 1.49, 1.49, 'Vegetable'),
+        ('Ginger Tea', 1.0, 3.99, 3.99, 'Vegetable'),
+    ]),
+    'enhanced_fallback': (TODAY, 'Kroger Plaza', 350.0, [
+        ('Discount Bread', 1.0, 2.0, 2.0, 'Grain'),
+        ('Coupon Savings', 1.0, 1.0, 1.0, 'Uncategorized'),
+    ]),
+    'month_name': (TODAY, 'Daily Needs Store', 11.98, [
+        ('Toilet Paper', 1.0, 8.99, 8.99, 'Household'),
+        ('Dish Soap', 1.0, 2.99, 2.99, 'Body soap'),
+    ]),
+}
+
+# Categories the original keyword search gave these item names
+CATEGORIES = {
+    'Milk 2L': 'Dairy',
+    'Organic Whole Wheat Bread': 'Grain',
+    'Bananas': 'Uncategorized',
+    'Pineapple Chunks': 'Uncategorized',
+    'Hot Dog Buns': 'Grain',
+    'Toilet Paper 12pk': 'Household',
+    'Face Wash': 'Personal Care',
+    'Ice Cream': 'Dairy',
+    'Sour Cream': 'Dairy',
+    'Body Lotion': 'Personal Care',
+    'Red Pepper': 'Vegetable',
+    'Black Pepper': 'Vegetable',
+    'Green Tea': 'Beverages',
+    'Salmon Fillet': 'Meat & Seafood',
+    'Basmati Rice': 'Grain',
+    'Agarbatti': 'Pooja item',
+    'Paper Towels': 'Household',
+    'Dish Soap': 'Body soap',
+    'Pinto Beans': 'Uncategorized',
+    'Coca Cola': 'Uncategorized',
+    'Creamer': 'Uncategorized',
+    'Steak': 'Meat & Seafood',
+    'Cilantro': 'Herb',
+    'Gift Card': 'Uncategorized',
+    '12/05/2023': 'Uncategorized',
+    '2x3': 'Uncategorized',
+    '3.99': 'Uncategorized',
+    'A': 'Uncategorized',
+    'Unknown Thing': 'Uncategorized',
+    'Toothbrush': 'Personal Care',
+    'Mozzarella': 'Dairy',
+    'Chips': 'Snacks',
+    'BEER': 'Beverages',
+    'Wine Glass': 'Beverages',
+    'Ice-Cream Cone': 'Dairy',
+    'Cream_Soda': 'Uncategorized',
+    'Hot Dogs': 'Meat & Seafood',
+    'Teapot': 'Uncategorized',
+    'Shampoo & Conditioner': 'Personal Care',
+}
+
+@pytest.fixture(scope='module')
+def service():
+    return OCRService()
+
+def summarize(bill):
+    items = [
+        (item['Item Name'], item['Quantity'], item['Cost per unit'], item['Total amount paid'], item['Item Type'])
+        for item in bill['line_items']
+    ]
+    return bill['Date'], bill['Shop Address'], bill['total_amount'], items
+
+def parse(service, text, patterns):
+    return service._parse_bill_lines(service._split_lines(text), patterns)[0]
+
+@pytest.mark.parametrize('name', RECEIPTS)
+def test_strict_parse_matches_original(service, name):
+    assert summarize(parse(service, RECEIPTS[name], STRICT_PARSER)) == STRICT[name]
+
+@pytest.mark.parametrize('name', RECEIPTS)
+def test_enhanced_parse_matches_original(service, name):
+    assert summarize(parse(service, RECEIPTS[name], ENHANCED_PARSER)) == ENHANCED[name]
+
+@pytest.mark.parametrize('name', RECEIPTS)
+def test_bill_from_text_falls_back_to_enhanced(service, name):
+    """Enhanced parsing replaces a strict parse with fewer than two items"""
+    expected = STRICT[name] if len(STRICT[name][3]) >= 2 else ENHANCED[name]
+    assert summarize(service._bill_from_text(RECEIPTS[name], 'receipt.jpg', None)) == expected
+
+@pytest.mark.parametrize('item_name, category', CATEGORIES.items())
+def test_categorize_matches_original(service, item_name, category):
+    assert service._categorize_item(item_name) == category
+
+@pytest.mark.skipif(not ocr_service.AHOCORASICK_AVAILABLE, reason='pyahocorasick is not installed')
+@pytest.mark.parametrize('item_name', CATEGORIES)
+def test_category_automaton_matches_regexes(monkeypatch, item_name):
+    name_lower = item_name.lower().strip()
+    category = ocr_service.match_category(name_lower)
+    monkeypatch.setattr(ocr_service, 'CATEGORY_AUTOMATON', None)
+    assert ocr_service.match_category(name_lower) == category
+
+@pytest.mark.parametrize('line', [
+    'Milk 3.99', 'Milk $3.99', 'Milk $ 3.99', 'Milk 399', 'Milk 39', 'Milk 3.9', 'Milk 3.999',
+    'Milk 1,299.00', 'Milk\t3.99', 'Milk  2L 3.99', 'Eggs 2 x 0.59', 'Cheddar Cheese 4.25 $',
+    'Milk 3.99$', 'Milk $$3.99', 'Milk .99', 'Milk 3.', 'Milk ３.９９', '3.99', 'Milk',
+])
+def test_split_item_price_matches_item_regex(line):
+    """The fast path either leaves a line to the regexes or captures what they would"""
+    split = split_item_price(line)
+    if split is not None:
+        assert split == ITEM_RES[0].match(line).groups()
+
+def test_split_item_price_handles_plain_lines():
+    assert split_item_price('Whole Wheat Bread $2.49') == ('Whole Wheat Bread', '2.49')
+    assert split_item_price('Milk 2L 3.99') == ('Milk 2L', '3.99')
@@ -0,0 +1,58 @@
+from fractions import Fraction
+
+import pytest
+from PIL import Image, ImageDraw
+
+from services import ocr_service
+from services.ocr_service import OCRService, otsu_threshold
+
+def best_threshold(histogram):
+    """Otsu's threshold by exhaustive search in exact arithmetic"""
+    total = sum(histogram)
+    sum_all = sum(level * count for level, count in enumerate(histogram))
+    best_level, best_variance = 0, 0
+    for level in range(256):
+        count_dark = sum(histogram[:level + 1])
+        count_light = total - count_dark
+        if count_dark == 0 or count_light == 0:
+            continue
+        sum_dark = sum(value * count for value, count in enumerate(histogram[:level + 1]))
+        mean_dark = Fraction(sum_dark, count_dark)
+        mean_light = Fraction(sum_all - sum_dark, count_light)
+        variance = count_dark * count_light * (mean_dark - mean_light) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+def save_receipt(path, size=(400, 600)):
+    """Save a light gray page with a dark bar of "text" on it"""
+    image = Image.new('L', size, 220)
+    ImageDraw.Draw(image).rectangle((50, 100, 350, 140), fill=30)
+    image.save(path)
+    return str(path)
+
+@pytest.fixture(scope='module')
+def service():
+    return OCRService()
+
+@pytest.mark.parametrize('counts', [
+    {40: 300, 200: 700},
+    {10: 5, 30: 20, 90: 50, 180: 400, 220: 100},
+    {level: 1 + (level * 37) % 101 for level in range(256)},
+    {128: 1000},
+])
+def test_otsu_threshold_maximizes_between_class_variance(counts):
+    histogram = [counts.get(level, 0) for level in range(256)]
+    assert otsu_threshold(histogram) == best_threshold(histogram)
+
+def test_preprocess_image_pil_binarizes(service, tmp_path):
+    image = service._preprocess_image_pil(save_receipt(tmp_path / 'receipt.png'))
+    assert image.mode == '1'
+    assert image.size == (400, 600)
+    assert image.getpixel((200, 120)) == 0
+    assert image.getpixel((200, 400)) == 255
+
+def test_preprocess_image_pil_downscales(service, tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr_service, 'PREPROCESS_MAX_EDGE', 300)
+    image = service._preprocess_image_pil(save_receipt(tmp_path / 'receipt.png'))
+    assert image.size == (200, 300)
@@ -0,0 +1,92 @@
+from PIL import Image
+
+from services import ocr_service
+from services.ocr_service import OCRService
+
+# GetTSVText output: level, page, block, paragraph, line, word, left, top,
+# width, height, confidence, text. Only word rows (level 5) carry text
+TSV = '\n'.join('\t'.join(map(str, row)) for row in [
+    (1, 1, 0, 0, 0, 0, 0, 0, 100, 40, -1, ''),
+    (4, 1, 1, 1, 1, 0, 0, 0, 100, 20, -1, ''),
+    (5, 1, 1, 1, 1, 1, 0, 0, 40, 20, 91.5, 'Milk'),
+    (5, 1, 1, 1, 1, 2, 50, 0, 40, 20, 88.0, '3.99'),
+    (5, 1, 1, 1, 2, 1, 0, 20, 40, 20, 12.0, '~~'),
+    (5, 1, 1, 1, 2, 2, 50, 20, 40, 20, 95.0, 'Bread'),
+])
+
+class StubTessBaseAPI:
+    """Records the calls OCRService makes on a tesserocr.PyTessBaseAPI"""
+    instances = []
+    
+    def __init__(self):
+        self.calls = []
+        self.instances.append(self)
+    
+    def SetPageSegMode(self, psm):
+        self.calls.append(('SetPageSegMode', psm))
+    
+    def SetVariable(self, name, value):
+        self.calls.append(('SetVariable', name, value))
+    
+    def SetImage(self, image):
+        self.calls.append(('SetImage', image.size))
+    
+    def GetTSVText(self, page):
+        return TSV
+    
+    def End(self):
+        self.calls.append(('End',))
+
+class StubTesserocr:
+    PyTessBaseAPI = StubTessBaseAPI
+
+class FailingTesserocr:
+    class PyTessBaseAPI:
+        def __init__(self):
+            raise RuntimeError('Failed to init API, possibly an invalid tessdata path')
+
+def tesserocr_service(monkeypatch, module):
+    monkeypatch.setattr(ocr_service, 'tesserocr', module, raising=False)
+    service = OCRService()
+    service.use_tesserocr = True
+    return service
+
+def test_tesseract_text_reuses_one_tesserocr_api(monkeypatch):
+    StubTessBaseAPI.instances.clear()
+    service = tesserocr_service(monkeypatch, StubTesserocr)
+    image = Image.new('L', (100, 40), 255)
+    
+    assert service._tesseract_text(image, 6) == ('Milk 3.99\nBread', 3)
+    assert service._tesseract_text(image, 3, invert=False) == ('Milk 3.99\nBread', 3)
+    
+    api, = StubTessBaseAPI.instances
+    assert api.calls == [
+        ('SetPageSegMode', 6), ('SetVariable', 'tessedit_do_invert', '1'), ('SetImage', (100, 40)),
+        ('SetPageSegMode', 3), ('SetVariable', 'tessedit_do_invert', '0'), ('SetImage', (100, 40)),
+    ]
+    
+    service.close()
+    assert api.calls[-1] == ('End',)
+    assert service.tesseract_api is None
+
+def test_tesseract_text_falls_back_to_the_cli(monkeypatch):
+    service = tesserocr_service(monkeypatch, FailingTesserocr)
+    data = {
+        'block_num': [1, 1], 'par_num': [1, 1], 'line_num': [1, 1],
+        'text': ['Eggs', '2.49'], 'conf': [90, 85]
+    }
+    monkeypatch.setattr(ocr_service.pytesseract, 'image_to_data', lambda image, config, output_type: data)
+    
+    assert service._tesseract_text(Image.new('L', (100, 40), 255), 6) == ('Eggs 2.49', 2)
+    assert not service.use_tesserocr
+    service.close()
+
+def test_shared_service_is_closed_at_exit(monkeypatch):
+    registered = []
+    monkeypatch.setattr(ocr_service.atexit, 'register', registered.append)
+    monkeypatch.setattr(ocr_service, 'ocr_service', None)
+    
+    service = ocr_service.get_ocr_service()
+    assert registered == [service.close]
+    assert ocr_service.get_ocr_service() is service
+    assert len(registered) == 1
@@ -5,6 +5,8 @@ import axios from 'axios';
 const API_BASE_URL = process.env.REACT_APP_API_URL || 
   (process.env.NODE_ENV === 'production' ? '/api' : 'http://localhost:5000/api');
 
+const JOB_POLL_INTERVAL_MS = 1000;
+
 const api = axios.create({
   baseURL: API_BASE_URL,
   headers: {
@@ -22,7 +24,15 @@ export const uploadBillImage = async (file) => {
     },
   });
   
-  return response.data;
+  // OCR runs in the background; poll the job until it completes
+  let job = response.data;
+  while (job.status === 'pending') {
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    const jobResponse = await api.get(`/bills/job/${response.data.job_id}`);
+    job = jobResponse.data;
+  }
+  
+  return job;
 };
 
 export const uploadBillCSV = async (file) => {